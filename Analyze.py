@@ -0,0 +1,196 @@
+import argparse
+import csv
+import json
+import os
+import struct
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from Game import Game
+from Service import analyze_batch, parse_request
+
+# position files, read one position at a time so the input can be any size:
+# - text: one position per line, "id n s side cells", cells holding the n*n cells column after column like
+#   current_state ('.', 'X', 'O', '$' for a bloc), e.g. "17 4 3 O X..O.$..X.......". Blank lines and lines starting
+#   with # are skipped
+# n goes up to Service.MAX_BOARD_SIZE (10) in every format, a bigger board gets an error record and is left out of a .bin file
+# - .jsonl: one Service request per line (n, s, blocs, cells, side, ...), depth/algo/h/t/options of the line win over
+#   the command line ones
+# - .bin: header, then per position a record (id, n, s, side 0 for X 1 for O) followed by its n*n cell bytes
+MAGIC = b'TTTPOS\0\0'
+VERSION = 1
+HEADER = struct.Struct('<8sI')
+RECORD = struct.Struct('<IBBB')
+FIELDS = ['id', 'move', 'value', 'nodes', 'time', 'error']
+
+
+def read_text(position_file):
+    for (line_number, line) in enumerate(position_file, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        fields = line.split()
+        if len(fields) != 5:
+            yield {'id': fields[0], 'error': F'line {line_number}: expected "id n s side cells"'}
+            continue
+        (position_id, n, s, side, cells) = fields
+        yield {'id': position_id, 'n': n, 's': s, 'side': side, 'cells': cells}
+
+
+def read_jsonl(position_file):
+    for (line_number, line) in enumerate(position_file, 1):
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as error:
+            yield {'id': line_number, 'error': str(error)}
+            continue
+        if not isinstance(request, dict):
+            yield {'id': line_number, 'error': F'line {line_number}: a request must be a JSON object'}
+            continue
+        yield dict(request, id=request.get('id', line_number))
+
+
+def read_binary(position_file):
+    header = position_file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return
+    (magic, version) = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(F'{position_file.name} is not a position file of version {VERSION}')
+    while True:
+        record = position_file.read(RECORD.size)
+        if len(record) < RECORD.size:
+            return
+        (position_id, n, s, side) = RECORD.unpack(record)
+        cells = position_file.read(n * n)
+        yield {'id': position_id, 'n': n, 's': s, 'side': 'O' if side else 'X', 'cells': cells.decode('ascii')}
+
+
+def read_positions(path):
+    # positions of a file as Service requests (or {'id', 'error'} for an unreadable one), one at a time
+    if path.endswith('.bin'):
+        with open(path, 'rb') as position_file:
+            yield from read_binary(position_file)
+        return
+    with open(path) as position_file:
+        yield from (read_jsonl(position_file) if path.endswith('.jsonl') else read_text(position_file))
+
+
+def write_binary(path, positions):
+    # write positions (requests with an integer id, n, s, side and cells) as a .bin file, returns how many.
+    # Positions that are not valid requests are left out
+    count = 0
+    with open(path, 'wb') as position_file:
+        position_file.write(HEADER.pack(MAGIC, VERSION))
+        for position in positions:
+            try:
+                request = parse_request(position)
+                position_id = int(position['id'])
+            except (ValueError, KeyError, TypeError):
+                continue
+            position_file.write(RECORD.pack(position_id, request['n'], request['s'], request['side'] == 'O'))
+            position_file.write(request['cells'].encode('ascii'))
+            count += 1
+    return count
+
+
+def analyze_chunk(chunk):
+    # worker side: the records of a chunk of (id, request or error) in order
+    records = []
+    for (position_id, request, error) in chunk:
+        if error is None:
+            answer = analyze_batch([request])[0]
+            error = answer.get('error')
+        if error is not None:
+            records.append({'id': position_id, 'error': error})
+            continue
+        stats = answer['stats']
+        records.append({'id': position_id, 'move': answer['move'], 'value': answer['value'], 'nodes': stats.get('nodes'), 'time': round(stats['time'], 6)})
+    return records
+
+
+def chunks_of(positions, settings, chunk_size):
+    # (id, request, error) chunks, the search settings of the command line filled in where a position has none
+    chunk = []
+    for position in positions:
+        request = None
+        error = position.get('error')
+        if error is None:
+            try:
+                request = parse_request(dict(settings, **position))
+            except (ValueError, KeyError, TypeError) as parse_error:
+                error = str(parse_error)
+        chunk.append((position['id'], request, error))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(path, output='analysis.jsonl', workers=1, depth=3, algo=Game.ALPHABETA, h=2, t=5, options={}, chunk_size=8):
+    # search every position of path and append one record per position to output as soon as its chunk is done.
+    # At most 2 chunks per worker are read ahead, so memory does not grow with the input. Returns the record count
+    settings = {'depth': depth, 'algo': algo, 'h': h, 't': t, 'options': options}
+    chunks = chunks_of(read_positions(path), settings, chunk_size)
+    is_csv = output.endswith('.csv')
+    new_csv = is_csv and not os.path.exists(output)
+    count = 0
+    with open(output, 'a', newline='') as output_file:
+        writer = None
+        if is_csv:
+            writer = csv.DictWriter(output_file, fieldnames=FIELDS)
+            if new_csv:
+                writer.writeheader()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            running = set()
+            exhausted = False
+            while running or not exhausted:
+                while not exhausted and len(running) < 2 * workers:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        exhausted = True
+                    else:
+                        running.add(executor.submit(analyze_chunk, chunk))
+                if not running:
+                    break
+                (done, running) = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for record in future.result():
+                        if is_csv:
+                            writer.writerow(record)
+                        else:
+                            output_file.write(json.dumps(record) + '\n')
+                        count += 1
+                output_file.flush()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Search the best move of every position of a file.')
+    parser.add_argument('positions', help='position file: text (id n s side cells per line), .jsonl requests or .bin')
+    parser.add_argument('-o', '--output', default='analysis.jsonl', help='result file, .jsonl or .csv, records are appended')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('-d', '--depth', type=int, default=3)
+    parser.add_argument('-a', '--algo', type=int, default=Game.ALPHABETA, help='minimax (0), alphabeta (1) or MCTS (4)')
+    parser.add_argument('--h', type=int, default=2, help='heuristic 0 (none), 1 or 2')
+    parser.add_argument('-t', type=float, default=5, help='time limit of a search in seconds')
+    parser.add_argument('--options', default='{}', help='Game engine options as JSON, e.g. \'{"bitboard": true}\'')
+    parser.add_argument('--chunk', type=int, default=8, help='positions sent to a worker at once')
+    parser.add_argument('--to-binary', metavar='PATH', help='only convert the positions to a .bin file')
+    args = parser.parse_args()
+
+    start = time.time()
+    if args.to_binary is not None:
+        count = write_binary(args.to_binary, read_positions(args.positions))
+        print(F'{count} positions written to {args.to_binary}')
+        return
+    count = run(args.positions, output=args.output, workers=args.workers, depth=args.depth, algo=args.algo, h=args.h, t=args.t,
+                options=json.loads(args.options), chunk_size=args.chunk)
+    print(F'{count} positions analyzed into {args.output} in {time.time() - start:.1f}s')
+
+
+if __name__ == "__main__":
+    main()
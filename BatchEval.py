@@ -0,0 +1,88 @@
+import numpy as np
+
+
+class BatchEval:
+    # cell codes of the board array
+    EMPTY = 0
+    X = 1
+    O = 2
+    BLOC = 3
+    # heuristic2 totals are summed in int64, 10^n per line stops fitting past this size
+    MAX_BOARD_SIZE = 15
+
+    def __init__(self, game):
+        n = game.board_size
+        self.board_size = n
+        # cell (x, y) is index x * n + y, index n * n is always empty and pads the shorter lines
+        pad = n * n
+
+        # the lines heuristic2_eval() scores, as one row of cell indices per line
+        self.line_index = np.full((len(game.lines), n), pad, dtype=np.intp)
+        for (k, line) in enumerate(game.lines):
+            for (m, (x, y)) in enumerate(line):
+                self.line_index[k, m] = x * n + y
+        self.line_value = np.array(game.line_value, dtype=np.int64)
+
+        # every s-length segment, a child wins if the player who moved owns all cells of one of them
+        segments = []
+        s = game.win_size
+        for (dx, dy) in game.DIRECTIONS:
+            for x in range(n):
+                for y in range(n):
+                    if 0 <= x + (s - 1) * dx < n and 0 <= y + (s - 1) * dy < n:
+                        segments.append([(x + k * dx) * n + (y + k * dy) for k in range(s)])
+        self.segment_index = np.array(segments, dtype=np.intp).reshape(len(segments), s)
+
+        # 3x3 neighbourhood of every cell for heuristic1_eval()
+        self.neighbour_index = np.full((n * n, 9), pad, dtype=np.intp)
+        for x in range(n):
+            for y in range(n):
+                m = 0
+                for i in range(x - 1, x + 2):
+                    for j in range(y - 1, y + 2):
+                        if 0 <= i < n and 0 <= j < n:
+                            self.neighbour_index[x * n + y, m] = i * n + j
+                            m += 1
+
+        self.win_value = pow(10, game.win_size)
+        self.codes = {'.': self.EMPTY, 'X': self.X, 'O': self.O, '$': self.BLOC}
+        self.board = np.zeros(n * n + 1, dtype=np.int8)
+
+    def load(self, current_state):
+        n = self.board_size
+        for x in range(n):
+            for y in range(n):
+                self.board[x * n + y] = self.codes[current_state[x][y]]
+
+    def set(self, x, y, char):
+        self.board[x * self.board_size + y] = self.codes[char]
+
+    def evaluate(self, moves, char, h, h1_at_move=False, last_empty=False):
+        # value of every child reached by playing char on one of moves (list of (x, y)), all children
+        # being leaves: a win, a tie when last_empty, otherwise heuristic h of the child.
+        # heuristic1 is taken on the move played when h1_at_move, on cell (0, 0) otherwise, like the search does
+        n = self.board_size
+        k = len(moves)
+        cells = np.array([x * n + y for (x, y) in moves], dtype=np.intp)
+        rows = np.arange(k)
+        children = np.repeat(self.board[np.newaxis, :], k, axis=0)
+        children[rows, cells] = self.codes[char]
+        is_x = children == self.X
+        is_o = children == self.O
+
+        # the position before the move was not over, so any full segment is a win for the player who moved
+        mover = is_x if char == 'X' else is_o
+        wins = mover[:, self.segment_index].all(axis=2).any(axis=1)
+
+        if h == 2:
+            counts_x = is_x[:, self.line_index].sum(axis=2)
+            counts_o = is_o[:, self.line_index].sum(axis=2)
+            values = self.line_value[counts_x, counts_o].sum(axis=1)
+        else:
+            h1_cells = cells if h1_at_move else np.zeros(k, dtype=np.intp)
+            values = is_x[rows[:, np.newaxis], self.neighbour_index[h1_cells]].sum(axis=1) * is_x[rows, h1_cells]
+
+        values = np.where(wins, self.win_value if char == 'X' else -self.win_value, values)
+        if last_empty:
+            values = np.where(wins, values, 0)
+        return values.tolist()
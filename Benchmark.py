@@ -0,0 +1,191 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+from Game import Game
+
+# bloc layouts of the benchmark positions, as a function of the board size
+LAYOUTS = {
+    'none': lambda n, rng: [],
+    'center': lambda n, rng: [F'{n // 2} {n // 2}'],
+    'corners': lambda n, rng: [F'{x} {y}' for x in (0, n - 1) for y in (0, n - 1)],
+    'random': lambda n, rng: [F'{x} {y}' for (x, y) in rng.sample([(x, y) for x in range(n) for y in range(n)], n // 2)],
+}
+# fixed search depth per board size (minimax, alphabeta)
+DEPTHS = {3: (4, 5), 4: (3, 4), 5: (3, 3), 6: (2, 3), 7: (2, 3), 8: (2, 3), 9: (2, 2), 10: (2, 2)}
+
+
+def make_game(n, s, layout, seed, options={}):
+    rng = random.Random(F'{seed}-{n}-{s}-{layout}')
+    blocs = LAYOUTS[layout](n, rng)
+    # the search benchmarks count nodes, so stats stay on whatever the options say
+    options = dict(options, stats=True)
+    g = Game(recommend=False, board_size=n, bloc_num=len(blocs), blocs_positions=blocs, win_size=s, t=10 ** 6, seed=seed, **options)
+    return (g, rng)
+
+
+def make_positions(g, rng, count=4):
+    # count positions that are not over yet, from 10% to 40% of the cells played, X and O taking turns
+    n = g.board_size
+    positions = []
+    while len(positions) < count:
+        g.initialize_game()
+        moves = [(x, y) for x in range(n) for y in range(n) if g.current_state[x][y] == '.']
+        rng.shuffle(moves)
+        played = (len(positions) + 1) * n * n // 10
+        for (k, (x, y)) in enumerate(moves[:played]):
+            g.current_state[x][y] = 'X' if k % 2 == 0 else 'O'
+        if g.is_end() is None:
+            positions.append([column[:] for column in g.current_state])
+    g.initialize_game()
+    return positions
+
+
+def load_position(g, position):
+    g.current_state = [column[:] for column in position]
+    g.empty_count = sum(column.count('.') for column in position)
+    g.player_turn = 'X' if (g.board_size * g.board_size - g.empty_count - g.bloc_num) % 2 == 0 else 'O'
+
+
+def best_of(rounds, run):
+    # shortest of rounds runs, the least noisy estimate of what run() costs
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def bench_config(n, s, layout, seed=0, repeat=20, rounds=3, options={}, searches=True, min_time=0.02):
+    # results of one (n, s, layout) configuration: calls (or search nodes) per second of each benchmark
+    (g, rng) = make_game(n, s, layout, seed, options)
+    positions = make_positions(g, rng)
+    cells = [(x, y) for x in range(n) for y in range(n)]
+    results = {}
+
+    def calls(function, repeat):
+        def run():
+            for position in positions:
+                load_position(g, position)
+                for _ in range(repeat):
+                    function()
+        return run
+
+    def heuristic1():
+        for (x, y) in cells:
+            g.heuristic1_eval(x, y)
+
+    for (name, function, per_call) in [('is_end', g.is_end, 1), ('heuristic1_eval', heuristic1, len(cells)), ('heuristic2_eval', g.heuristic2_eval, 1)]:
+        # at least repeat calls per position, doubled until one run takes min_time so timer noise stays small
+        while best_of(1, calls(function, repeat)) < min_time:
+            repeat *= 2
+        seconds = best_of(rounds, calls(function, repeat))
+        count = len(positions) * repeat * per_call
+        results[name] = {'seconds': seconds, 'calls': count, 'per_sec': count / seconds}
+
+    if not searches:
+        return results
+    (minimax_depth, alphabeta_depth) = DEPTHS.get(n, (2, 2))
+    for (name, algo, depth) in [('minimax', Game.MINIMAX, minimax_depth), ('alphabeta', Game.ALPHABETA, alphabeta_depth)]:
+        load_position(g, positions[0])
+        g.max_depth_X = depth
+        g.max_depth_O = depth
+        max = g.player_turn == 'O'
+        if g.tt is not None:
+            g.tt.clear()
+        g.stats.reset()
+        start = time.perf_counter()
+        if algo == Game.MINIMAX:
+            (value, x, y) = g.minimax(max=max, h=2, startTime=time.time())
+        else:
+            (value, x, y) = g.alphabeta(max=max, h=2, startTime=time.time())
+        seconds = time.perf_counter() - start
+        # nodes per second, the node and evaluation counts and the move also tell whether a change altered the search itself
+        counters = g.stats.search
+        results[name] = {'seconds': seconds, 'per_sec': counters.node_count() / seconds, 'depth': depth, 'nodes': counters.node_count(),
+                         'evaluations': counters.evaluation_count(), 'move': [x, y], 'value': value}
+    g.close()
+    return results
+
+
+def run(sizes=range(3, 11), win_sizes=range(3, 6), layouts=LAYOUTS, seed=0, repeat=20, rounds=3, options={}, searches=True):
+    report = {}
+    for n in sizes:
+        for s in win_sizes:
+            if s > n:
+                continue
+            for layout in layouts:
+                key = F'n{n}-s{s}-{layout}'
+                for (name, result) in bench_config(n, s, layout, seed, repeat, rounds, options, searches).items():
+                    report[F'{name}/{key}'] = result
+                    line = F'{name:16} {key:18} {result["seconds"] * 1000:10.2f} ms {result["per_sec"]:14.0f}/s'
+                    if 'evaluations' in result:
+                        line += F'  depth {result["depth"]} nodes {result["nodes"]} evaluations {result["evaluations"]}'
+                    print(line)
+    return report
+
+
+def compare(report, baseline, threshold=10):
+    # single entries are short and noisy, so a benchmark regresses when the geometric mean of its rates
+    # (calls or nodes per second) over all configurations is more than threshold percent below the baseline.
+    # Entries past the threshold are listed to show where to look
+    regressions = []
+    for name in ['is_end', 'heuristic1_eval', 'heuristic2_eval', 'minimax', 'alphabeta']:
+        keys = [key for key in report if key.startswith(name + '/') and key in baseline]
+        if not keys:
+            continue
+        log_ratio = 0
+        for key in keys:
+            (base, result) = (baseline[key], report[key])
+            log_ratio += math.log(base['per_sec'] / result['per_sec'])
+            change = 100 * (base['per_sec'] / result['per_sec'] - 1)
+            if change > threshold:
+                print(F'slower {key}: {base["per_sec"]:.0f}/s -> {result["per_sec"]:.0f}/s ({change:.1f}%)')
+            if 'evaluations' in base and result['evaluations'] != base['evaluations']:
+                print(F'changed search {key}: {base["evaluations"]} -> {result["evaluations"]} evaluations')
+        change = 100 * (math.exp(log_ratio / len(keys)) - 1)
+        if change > threshold:
+            regressions.append(name)
+        print(F'{"REGRESSION " if change > threshold else ""}{name}: {change:+.1f}% time per call over {len(keys)} configurations')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time is_end, the heuristics and fixed depth searches on seeded positions.')
+    parser.add_argument('--baseline', default='benchmark_baseline.json', help='baseline JSON file to compare against')
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=10, help='percent slowdown counted as a regression')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(range(3, 11)))
+    parser.add_argument('--win-sizes', type=int, nargs='+', default=[3, 4, 5])
+    parser.add_argument('--layouts', nargs='+', default=list(LAYOUTS), choices=list(LAYOUTS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=20, help='calls per position of the is_end/heuristic benchmarks')
+    parser.add_argument('--rounds', type=int, default=3, help='the best of rounds runs is kept')
+    parser.add_argument('--options', default='{}', help='Game engine options as JSON, e.g. \'{"bitboard": true}\'')
+    parser.add_argument('--no-search', action='store_true', help='skip the minimax/alphabeta searches')
+    args = parser.parse_args()
+
+    # a run that has nothing to compare against must not look like a run without regressions
+    if not args.save and not os.path.exists(args.baseline):
+        sys.exit(F'no baseline {args.baseline} on this machine, run "python3 Benchmark.py --save" first to store one')
+    report = run(args.sizes, args.win_sizes, args.layouts, args.seed, args.repeat, args.rounds, json.loads(args.options), not args.no_search)
+    if args.save:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(report, baseline_file, indent=1, sort_keys=True)
+        print(F'baseline written to {args.baseline}')
+        return
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    if compare(report, baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
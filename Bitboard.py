@@ -0,0 +1,364 @@
+import time
+
+try:
+    popcount = int.bit_count
+except AttributeError:
+    # python < 3.10 (older pypy3) has no int.bit_count
+    def popcount(bits):
+        return bin(bits).count('1')
+
+
+class Bitboard:
+    # the four line directions through a cell: vertical, horizontal and both diagonals
+    DIRECTIONS = [(1, 0), (0, 1), (1, 1), (1, -1)]
+
+    def __init__(self, game):
+        # cell (x, y) of game.current_state is bit x * n + y, so walking the bits from low to high
+        # visits the cells in the same order as the nested loops of Game.minimax()/alphabeta()
+        self.game = game
+        self.board_size = game.board_size
+        self.win_size = game.win_size
+        n = self.board_size
+        s = self.win_size
+        self.full_mask = (1 << (n * n)) - 1
+        self.pow10 = [pow(10, k) for k in range(n + 1)]
+
+        self.bloc_bits = 0
+        for bloc in game.blocs_positions:
+            self.bloc_bits |= 1 << (int(bloc[0]) * n + int(bloc[2]))
+
+        # one mask per s-length segment that can still be won, i.e. that does not go through a bloc
+        self.win_masks = []
+        self.cell_win_masks = [[] for _ in range(n * n)]
+        for (dx, dy) in self.DIRECTIONS:
+            for x in range(n):
+                for y in range(n):
+                    if not (0 <= x + (s - 1) * dx < n and 0 <= y + (s - 1) * dy < n):
+                        continue
+                    cells = [(x + k * dx) * n + (y + k * dy) for k in range(s)]
+                    mask = 0
+                    for cell in cells:
+                        mask |= 1 << cell
+                    if mask & self.bloc_bits:
+                        continue
+                    self.win_masks.append(mask)
+                    for cell in cells:
+                        self.cell_win_masks[cell].append(mask)
+
+        # full lines scored by heuristic2_eval(): every row and column, and the diagonals at least s long
+        self.line_masks = []
+        for i in range(n):
+            self.line_masks.append(sum(1 << (x * n + i) for x in range(n)))
+            self.line_masks.append(sum(1 << (i * n + y) for y in range(n)))
+        for k in range(-n + 1, n):
+            diag = [(x, x + k) for x in range(n) if 0 <= x + k < n]
+            anti = [(x, n - 1 + k - x) for x in range(n) if 0 <= n - 1 + k - x < n]
+            for line in (diag, anti):
+                if len(line) >= s:
+                    self.line_masks.append(sum(1 << (x * n + y) for (x, y) in line))
+
+        # 3x3 neighbourhood of every cell (clipped at the border) for heuristic1_eval()
+        self.neighbour_masks = []
+        for x in range(n):
+            for y in range(n):
+                mask = 0
+                for i in range(x - 1, x + 2):
+                    for j in range(y - 1, y + 2):
+                        if 0 <= i < n and 0 <= j < n:
+                            mask |= 1 << (i * n + j)
+                self.neighbour_masks.append(mask)
+
+        self.x_bits = 0
+        self.o_bits = 0
+        self.empty_count = 0
+
+    def load(self, current_state):
+        # convert the list of lists board into bitmasks
+        n = self.board_size
+        self.x_bits = 0
+        self.o_bits = 0
+        for x in range(n):
+            for y in range(n):
+                if current_state[x][y] == 'X':
+                    self.x_bits |= 1 << (x * n + y)
+                elif current_state[x][y] == 'O':
+                    self.o_bits |= 1 << (x * n + y)
+        self.empty_count = popcount(self.empty_mask())
+
+    def to_state(self):
+        # convert the bitmasks back into a list of lists board (for draw_board(), traces, input_move())
+        n = self.board_size
+        state = [['.'] * n for _ in range(n)]
+        for x in range(n):
+            for y in range(n):
+                bit = 1 << (x * n + y)
+                if self.x_bits & bit:
+                    state[x][y] = 'X'
+                elif self.o_bits & bit:
+                    state[x][y] = 'O'
+                elif self.bloc_bits & bit:
+                    state[x][y] = '$'
+        return state
+
+    def empty_mask(self):
+        return self.full_mask & ~(self.x_bits | self.o_bits | self.bloc_bits)
+
+    def is_end(self):
+        # full board check, same results as Game.is_end()
+        for mask in self.win_masks:
+            if self.x_bits & mask == mask:
+                return 'X'
+        for mask in self.win_masks:
+            if self.o_bits & mask == mask:
+                return 'O'
+        if self.empty_count == 0:
+            return '.'
+        return None
+
+    def is_end_at(self, cell):
+        # only the segments through the last move can hold a new win
+        if (self.x_bits >> cell) & 1:
+            bits = self.x_bits
+            char = 'X'
+        else:
+            bits = self.o_bits
+            char = 'O'
+        for mask in self.cell_win_masks[cell]:
+            if bits & mask == mask:
+                return char
+        if self.empty_count == 0:
+            return '.'
+        return None
+
+    # Heuristic 1: number of X's around (and on) the cell, 0 if the cell is not an X (same as Game.heuristic1_eval())
+    def heuristic1_eval(self, cell=0):
+        if (self.x_bits >> cell) & 1:
+            return popcount(self.x_bits & self.neighbour_masks[cell])
+        return 0
+
+    # Heuristic 2: same scoring as Game.heuristic2_eval(), two popcounts per line
+    def heuristic2_eval(self):
+        e2 = 0
+        for mask in self.line_masks:
+            tempx = popcount(self.x_bits & mask)
+            tempo = popcount(self.o_bits & mask)
+            if tempx > tempo:
+                e2 += self.pow10[tempx]
+            elif tempo > tempx:
+                e2 -= self.pow10[tempo]
+            elif tempx != 0:
+                e2 += self.pow10[tempx]
+        return e2
+
+    def candidate_mask(self, h):
+        # bits of the cells the search tries: the empty ones, or only the live ones (LiveCells)
+        if self.game.live is not None:
+            return self.game.live.candidates(self.x_bits, self.o_bits, h)[0]
+        return self.empty_mask()
+
+    def move_order(self, current_depth, h=0):
+        # bits of the candidate cells in the order alphabeta() searches them
+        n = self.board_size
+        game = self.game
+        moves = self.candidate_mask(h)
+        order = []
+        while moves:
+            bit = moves & -moves
+            moves ^= bit
+            order.append(bit)
+        first = None
+        if current_depth == 0 and game.root_move is not None:
+            first = game.root_move
+        if game.ordering is not None:
+            cells = [((bit.bit_length() - 1) // n, (bit.bit_length() - 1) % n) for bit in order]
+            return [1 << (x * n + y) for (x, y) in game.ordering.order(cells, current_depth, first)]
+        if first is not None:
+            bit = 1 << (first[0] * n + first[1])
+            if bit in order:
+                order.remove(bit)
+                order.insert(0, bit)
+        return order
+
+    def minimax(self, max=False, current_depth=0, current_cell=0, h=0, startTime=0, max_depth=0, last_cell=-1):
+        # same search as Game.minimax(), on the bitmasks
+        game = self.game
+        stats = game.stats
+        if stats is not None:
+            stats.nodes[current_depth] += 1
+        if game.deadline is None:
+            currentTime = time.time()
+        win_value = self.pow10[self.win_size]
+        value = 2 * win_value if max else -2 * win_value
+        cell = None
+        if game.deadline is not None and game.out_of_time():
+            return (value, None, None)
+
+        result = self.is_end() if last_cell < 0 else self.is_end_at(last_cell)
+        if result is not None and stats is not None:
+            stats.leaves[current_depth] += 1
+            stats.terminals[current_depth] += 1
+        if result == 'X':
+            return (win_value, None, None)
+        elif result == 'O':
+            return (-win_value, None, None)
+        elif result == '.':
+            return (0, None, None)
+        if h == 0 and game.book_active and current_depth > 0:
+            entry = game.book.lookup(self.x_bits | (self.o_bits << (self.board_size * self.board_size)))
+            if entry is not None:
+                if stats is not None:
+                    stats.leaves[current_depth] += 1
+                return entry
+        if current_depth == max_depth or (game.deadline is None and currentTime - startTime >= game.t - 0.15):
+            if stats is not None and (h != 0 or game.deadline is not None):
+                stats.leaves[current_depth] += 1
+            if h == 1:
+                return (self.heuristic1_eval(cell=current_cell), None, None)
+            elif h == 2:
+                return (self.heuristic2_eval(), None, None)
+            elif game.deadline is not None:
+                # iterative deepening horizon without a heuristic
+                return (0, None, None)
+
+        moves = self.candidate_mask(h)
+        # the best move of the previous iterative deepening depth goes first
+        first = 0
+        if current_depth == 0 and game.root_move is not None:
+            first = (1 << (game.root_move[0] * self.board_size + game.root_move[1])) & moves
+        symmetries = game.node_symmetries[current_depth]
+        if symmetries:
+            # only the first move (in the order of the loop below) of every set of equivalent moves is searched
+            cells = [cell for cell in range(self.board_size * self.board_size) if (moves >> cell) & 1 and (1 << cell) != first]
+            if first:
+                cells.insert(0, first.bit_length() - 1)
+            moves = 0
+            for cell in game.symmetry.unique_cells(cells, symmetries):
+                moves |= 1 << cell
+        elif game.symmetry is not None:
+            game.node_symmetries[current_depth + 1] = []
+        while moves:
+            if first:
+                bit = first
+                first = 0
+            else:
+                bit = moves & -moves
+            moves ^= bit
+            i = bit.bit_length() - 1
+            if symmetries:
+                game.node_symmetries[current_depth + 1] = game.symmetry.stabilizer(symmetries, i)
+            self.empty_count -= 1
+            if max:
+                self.o_bits |= bit
+                (v, _, _) = self.minimax(max=False, current_depth=current_depth + 1, current_cell=i, h=h, startTime=startTime, max_depth=max_depth, last_cell=i)
+                self.o_bits ^= bit
+                if v < value:
+                    value = v
+                    cell = i
+            else:
+                self.x_bits |= bit
+                # Game.minimax() does not pass the cell to heuristic1_eval() after an X move
+                (v, _, _) = self.minimax(max=True, current_depth=current_depth + 1, h=h, startTime=startTime, max_depth=max_depth, last_cell=i)
+                self.x_bits ^= bit
+                if v > value:
+                    value = v
+                    cell = i
+            self.empty_count += 1
+            if game.search_aborted:
+                break
+        if cell is None:
+            return (value, None, None)
+        return (value, cell // self.board_size, cell % self.board_size)
+
+    def alphabeta(self, alpha, beta, max=False, current_depth=0, h=0, startTime=0, currentTime=0, max_depth=0, last_cell=-1):
+        # same search as Game.alphabeta(), on the bitmasks (alpha bounds O, beta bounds X)
+        game = self.game
+        stats = game.stats
+        if stats is not None:
+            stats.nodes[current_depth] += 1
+        if current_depth > 0 and game.deadline is None:
+            currentTime = time.time()
+        win_value = self.pow10[self.win_size]
+        value = 2 * win_value if max else -2 * win_value
+        cell = None
+        if game.deadline is not None and game.out_of_time():
+            return (value, None, None)
+
+        result = self.is_end() if last_cell < 0 else self.is_end_at(last_cell)
+        if result is not None and stats is not None:
+            stats.leaves[current_depth] += 1
+            stats.terminals[current_depth] += 1
+        if result == 'X':
+            return (win_value, None, None)
+        elif result == 'O':
+            return (-win_value, None, None)
+        elif result == '.':
+            return (0, None, None)
+        if h == 0 and game.book_active and current_depth > 0:
+            entry = game.book.lookup(self.x_bits | (self.o_bits << (self.board_size * self.board_size)))
+            if entry is not None:
+                if stats is not None:
+                    stats.leaves[current_depth] += 1
+                return entry
+        if current_depth == max_depth or (game.deadline is None and currentTime - startTime >= game.t - 0.15):
+            if stats is not None and (h != 0 or game.deadline is not None):
+                stats.leaves[current_depth] += 1
+            if h == 1:
+                # Game.alphabeta() always evaluates heuristic1_eval() on cell (0, 0)
+                return (self.heuristic1_eval(cell=0), None, None)
+            elif h == 2:
+                return (self.heuristic2_eval(), None, None)
+            elif game.deadline is not None:
+                # iterative deepening horizon without a heuristic
+                return (0, None, None)
+
+        order = self.move_order(current_depth, h)
+        symmetries = game.node_symmetries[current_depth]
+        if symmetries:
+            order = [1 << cell for cell in game.symmetry.unique_cells([bit.bit_length() - 1 for bit in order], symmetries)]
+        elif game.symmetry is not None:
+            game.node_symmetries[current_depth + 1] = []
+        for (index, bit) in enumerate(order):
+            i = bit.bit_length() - 1
+            if symmetries:
+                game.node_symmetries[current_depth + 1] = game.symmetry.stabilizer(symmetries, i)
+            self.empty_count -= 1
+            if max:
+                self.o_bits |= bit
+                (v, _, _) = self.alphabeta(alpha, beta, max=False, current_depth=current_depth + 1, h=h, startTime=startTime, max_depth=max_depth, last_cell=i)
+                self.o_bits ^= bit
+                if v < value:
+                    value = v
+                    cell = i
+            else:
+                self.x_bits |= bit
+                (v, _, _) = self.alphabeta(alpha, beta, max=True, current_depth=current_depth + 1, h=h, startTime=startTime, max_depth=max_depth, last_cell=i)
+                self.x_bits ^= bit
+                if v > value:
+                    value = v
+                    cell = i
+            self.empty_count += 1
+            if game.search_aborted:
+                break
+            if max:
+                if value <= beta:
+                    if game.ordering is not None:
+                        game.ordering.cutoff((i // self.board_size, i % self.board_size), current_depth, max_depth - current_depth)
+                    if stats is not None:
+                        stats.cutoffs[current_depth] += 1
+                        stats.cutoff_moves[index] += 1
+                    break
+                if value < alpha:
+                    alpha = value
+            else:
+                if value >= alpha:
+                    if game.ordering is not None:
+                        game.ordering.cutoff((i // self.board_size, i % self.board_size), current_depth, max_depth - current_depth)
+                    if stats is not None:
+                        stats.cutoffs[current_depth] += 1
+                        stats.cutoff_moves[index] += 1
+                    break
+                if value > beta:
+                    beta = value
+        if cell is None:
+            return (value, None, None)
+        return (value, cell // self.board_size, cell % self.board_size)
@@ -1,16 +1,44 @@
+import io
+import random
 import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 
+from BatchEval import BatchEval
+from Bitboard import Bitboard
+from MCTS import MonteCarloTreeSearch
+from LiveCells import LiveCells
+from MoveOrdering import MoveOrdering
+from Negamax import Negamax
+from OpeningBook import OpeningBook
+from ParallelSearch import RootParallel
+from Ponder import Ponderer
+from SearchStats import Counters, RunningStats, SearchStats, TimeStats
+from SolvedCache import SolvedCache
+from StackSearch import StackSearch
+from Symmetry import Symmetry
+from ThreatSpace import ThreatSearch
+from Trace import TRACE_FORMATS, format_percentiles, open_trace
+from TranspositionTable import TranspositionTable
+
 
 class Game:
     MINIMAX = 0
     ALPHABETA = 1
     AI = 2
     HUMAN = 3
+    MCTS = 4
     COLUMN = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K', 'L', 'M', 'N', 'O', 'P', 'Q', 'R', 'S', 'T', 'U',
               'V', 'W', 'X', 'Y', 'Z']
-
-    def __init__(self, recommend=True, board_size=3, bloc_num=0, blocs_positions=[], win_size=3, t=0, max_depth_X=0, max_depth_O=0, series=False, winner='.'):
+    # the four line directions through a cell: vertical, horizontal and both diagonals
+    DIRECTIONS = [(1, 0), (0, 1), (1, 1), (1, -1)]
+    # iterative deepening only looks at the clock once every CLOCK_INTERVAL nodes
+    CLOCK_INTERVAL = 256
+    # engine options that never change the result of a search, left out of the solved cache keys
+    NEUTRAL_OPTIONS = ('workers', 'stats', 'ponder', 'solved_cache', 'solved_cache_size')
+
+    def __init__(self, recommend=True, board_size=3, bloc_num=0, blocs_positions=[], win_size=3, t=0, max_depth_X=0, max_depth_O=0, series=False, winner='.', incremental_end=True, bitboard=False, tt_size=0, iterative=False, move_ordering=False, incremental_eval=False, batch_eval=False, workers=1, seed=None, stats=True, trace_format='text', trace_gzip=False, quiet=False, symmetry=False, book=None, threats=False, pvs=False, ponder=False, live_cells=False, radius=0, stack_search=False, solved_cache=None, solved_cache_size=100000):
         self.recommend = recommend
         # game parameters
         self.board_size = board_size
@@ -21,15 +49,108 @@ class Game:
         self.max_depth_X = max_depth_X
         self.max_depth_O = max_depth_O
         self.series = series
+        # gameTrace as 'text' (human-readable) or 'jsonl' (move log), optionally gzip compressed
+        self.trace_format = trace_format
+        self.trace_gzip = trace_gzip
+        # no console output in AI vs AI games
+        self.quiet = quiet
+        self.console = True
         self.winner = winner
-
-        # stats
-        self.all_evaluation_run_time = []
-        self.all_evaluation_run_time_per_round = []
-        self.evaluation_count = 0
-        self.evaluation_count_per_round = 0
-        self.evaluation_count_by_depth = {}
-        self.evaluation_count_by_depth_per_round = {}
+        # search engine options, so worker processes can build the same game
+        self.options = {'incremental_end': incremental_end, 'bitboard': bitboard, 'tt_size': tt_size, 'iterative': iterative, 'move_ordering': move_ordering,
+                        'incremental_eval': incremental_eval, 'batch_eval': batch_eval, 'workers': workers, 'stats': stats is not False,
+                        'symmetry': symmetry, 'book': book, 'threats': threats, 'pvs': pvs, 'ponder': ponder,
+                        'live_cells': live_cells, 'radius': radius, 'stack_search': stack_search,
+                        'solved_cache': solved_cache, 'solved_cache_size': solved_cache_size}
+        # only check the lines through the last move during search instead of the whole board
+        self.incremental_end = incremental_end
+        # run the searches on integer bitmasks instead of current_state
+        self.bitboard = Bitboard(self) if bitboard else None
+        if bitboard and tt_size > 0:
+            # the bitboard search neither probes nor stores the table, tt_size would silently do nothing
+            raise ValueError('tt_size needs the list search, it cannot be used with bitboard')
+
+        # transposition table with at most tt_size entries (0 turns it off), shared by every search of this game
+        self.tt = TranspositionTable(tt_size) if tt_size > 0 else None
+        # zobrist keys: one random number per (piece, cell), one for O to move, one per (algorithm, heuristic)
+        # so values searched with different settings never mix
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        rng = random.Random(self.seed)
+        self.zobrist = {piece: [[rng.getrandbits(64) for y in range(board_size)] for x in range(board_size)] for piece in 'XO$'}
+        self.zobrist_turn = rng.getrandbits(64)
+        self.zobrist_search = [[rng.getrandbits(64) for h in range(3)] for algo in range(2)]
+        self.hash = 0
+        self.tt_timed_out = False
+
+        # iterative deepening: search depth 1, 2, 3, ... until the time budget t runs out
+        self.iterative = iterative
+        self.deadline = None
+        self.root_move = None
+        self.search_aborted = False
+        self.node_count = 0
+
+        # alphabeta() move ordering: hash move, killer moves, history table and a static center/open line prior
+        self.ordering = MoveOrdering(self) if move_ordering else None
+        # only search the cells that can still be part of a line (and, with a radius, the ones near the pieces)
+        self.live = LiveCells(self, radius) if (live_cells or radius > 0) else None
+
+        # heuristic2 as a running total of per-line X/O counts updated on every move of the search
+        self.incremental_eval = incremental_eval
+        self.init_line_tables()
+        # score all the children of a node one ply above the depth limit in one numpy call
+        self.batch = BatchEval(self) if (batch_eval and board_size <= BatchEval.MAX_BOARD_SIZE) else None
+        # split the moves of the root over a pool of worker processes
+        self.parallel = RootParallel(self, workers) if (workers > 1 and board_size <= RootParallel.MAX_BOARD_SIZE) else None
+        # alphabeta() as a negamax principal variation search with aspiration windows: same values and moves, fewer nodes
+        self.pvs = Negamax(self) if pvs else None
+        # minimax()/alphabeta() as a loop over per-ply lists instead of recursive calls: same values and moves, more nodes/s
+        self.stack = StackSearch(self) if stack_search else None
+        # results of finished searches from the root in a file shared by every game, worker and run that names it
+        self.solved = SolvedCache(solved_cache, solved_cache_size) if solved_cache is not None else None
+
+        # skip moves that are equivalent under the rotations/reflections the position has (the heuristic1 leaf value
+        # depends on the orientation of the board, so only with heuristic2 or without heuristic).
+        # node_symmetries[depth] holds the symmetries of the node being searched at that depth
+        self.symmetry = Symmetry(board_size) if symmetry else None
+        self.node_symmetries = [[] for _ in range(board_size * board_size + 2)]
+        # with a transposition table the keys are canonical: the smallest zobrist hash over the 8 transforms of the board,
+        # hashes[k] being the hash of the board mapped by transform k, so equivalent positions share their entries
+        self.canonical_tt = symmetry and self.tt is not None
+        self.hashes = [0] * 8
+        if self.canonical_tt:
+            perms = self.symmetry.perms
+            self.zobrist_sym = {piece: [[[self.zobrist[piece][perm[x * board_size + y] // board_size][perm[x * board_size + y] % board_size] for perm in perms]
+                                         for y in range(board_size)] for x in range(board_size)] for piece in 'XO$'}
+
+        # solved positions (book file, or directory of book files, written by OpeningBook.py): a position found there
+        # is not searched. At the root the book move is played whatever the heuristic, deeper in the tree the book is
+        # only used without heuristic, where its values are the ones the search would find.
+        # book_key is x_bits | o_bits << n * n of current_state, kept up to date by make_move()/undo_move()
+        self.book = OpeningBook(book, self) if (book and board_size <= OpeningBook.MAX_BOARD_SIZE) else None
+        self.book_key = 0
+        self.book_active = False
+
+        # Monte Carlo tree search (algorithm MCTS), made on its first use, its tree is kept from move to move
+        self.mcts = None
+
+        # search ahead on a background thread while a human types a move
+        self.ponderer = Ponderer(self) if ponder else None
+
+        # look for a forced win (or the only defense against one) in the threats of the position before every search,
+        # only with lines of 4 and more, shorter ones leave too few moves that are not a threat
+        self.threats = ThreatSearch(self) if (threats and self.win_size >= ThreatSearch.MIN_WIN_SIZE) else None
+
+        # stats: per-depth search counters (nodes, evaluations, terminal positions, cutoffs), False turns them off.
+        # A SearchStats can be passed in to time the heuristics or get a callback after every search
+        self.stats = None
+        if stats is not False:
+            self.stats = stats if isinstance(stats, SearchStats) else SearchStats(board_size)
+            self.stats.attach(self)
+        # move times of the game and of the current round, as running stats and a latency histogram
+        self.evaluation_times = TimeStats()
+        self.round_evaluation_times = TimeStats()
+        # transposition table hits, misses and collisions
+        self.tt_count = [0, 0, 0]
 
         self.turn_count = 0
         self.initialize_game()
@@ -42,44 +163,26 @@ class Game:
         for bloc in self.blocs_positions:
             self.current_state[int(bloc[0])][int(bloc[2])] = '$'
 
+        # running count of the empty cells so the tie check is O(1)
+        self.empty_count = sum(row.count('.') for row in self.current_state)
+
         # Player X always plays first
         self.player_turn = 'X'
 
+    def render_board(self):
+        # the board as printed and traced, built as one string
+        lines = ["", "  " + "".join(self.COLUMN[:self.board_size]), " +" + "-" * self.board_size]
+        for y in range(0, self.board_size):
+            lines.append(str(y) + "|" + "".join(self.current_state[x][y] for x in range(0, self.board_size)))
+        return "\n".join(lines) + "\n\n"
+
     def draw_board(self, trace=False, trace_file=None):
         # if game trace option is on, output it in the .txt file
+        board = self.render_board()
         if trace:
-            space = ' '
-            trace_file.write("\n")
-            for y in range(0, self.board_size):
-                if (y != 0):
-                    space = ''
-                trace_file.write(str(space * 2) + str(self.COLUMN[y]))
-            trace_file.write("\n")
-            trace_file.write(" +" + str("-" * self.board_size) + "\n")
-            for y in range(0, self.board_size):
-                for x in range(0, self.board_size):
-                    if (x == 0):
-                        trace_file.write(str(y) + "|" + str(self.current_state[x][y]))
-                    else:
-                        trace_file.write(str(self.current_state[x][y]))
-                trace_file.write("\n")
-            trace_file.write("\n")
-        space = ' '
-        print()
-        for y in range(0, self.board_size):
-            if (y != 0):
-                space = ''
-            print(F'{space * 2}{self.COLUMN[y]}', end="")
-        print()
-        print(" +" + "-" * self.board_size)
-        for y in range(0, self.board_size):
-            for x in range(0, self.board_size):
-                if (x == 0):
-                    print(F'{y}|{self.current_state[x][y]}', end="")
-                else:
-                    print(F'{self.current_state[x][y]}', end="")
-            print()
-        print()
+            trace_file.write(board)
+        if self.console:
+            print(board, end="")
 
     def is_valid(self, px, py):
         if px < 0 or px > (self.board_size - 1) or py < 0 or py > (self.board_size - 1):
@@ -130,25 +233,123 @@ class Game:
         # It's a tie!
         return '.'
 
+    def compute_hash(self, max=False):
+        # zobrist hash of current_state, the search updates it incrementally from there
+        value = self.zobrist_turn if max else 0
+        for i in range(0, self.board_size):
+            for j in range(0, self.board_size):
+                if self.current_state[i][j] != '.':
+                    value ^= self.zobrist[self.current_state[i][j]][i][j]
+        return value
+
+    def make_move(self, i, j, char):
+        # place a piece during the search and keep the incremental state up to date
+        self.current_state[i][j] = char
+        self.empty_count -= 1
+        self.hash ^= self.zobrist[char][i][j] ^ self.zobrist_turn
+        if self.canonical_tt:
+            self.update_hashes(i, j, char)
+        if self.book is not None:
+            self.book_key += 1 << (i * self.board_size + j + (self.board_size * self.board_size if char == 'O' else 0))
+        if self.incremental_eval:
+            self.update_lines(i, j, char, 1)
+        if self.batch is not None:
+            self.batch.set(i, j, char)
+        if self.live is not None:
+            self.live.set(i, j, char)
+
+    def undo_move(self, i, j):
+        char = self.current_state[i][j]
+        self.current_state[i][j] = '.'
+        self.empty_count += 1
+        self.hash ^= self.zobrist[char][i][j] ^ self.zobrist_turn
+        if self.canonical_tt:
+            self.update_hashes(i, j, char)
+        if self.book is not None:
+            self.book_key -= 1 << (i * self.board_size + j + (self.board_size * self.board_size if char == 'O' else 0))
+        if self.incremental_eval:
+            self.update_lines(i, j, char, -1)
+        if self.batch is not None:
+            self.batch.set(i, j, '.')
+        if self.live is not None:
+            self.live.set(i, j, char)
+
+    def update_hashes(self, i, j, char):
+        # add or remove a piece in the hashes of the 8 transforms of the board
+        hashes = self.hashes
+        z = self.zobrist_sym[char][i][j]
+        turn = self.zobrist_turn
+        for k in range(8):
+            hashes[k] ^= z[k] ^ turn
+
+    def tt_key(self, algo, h):
+        # transposition table key of the position and the transform that maps it to the stored (canonical) one
+        if self.canonical_tt and h != 1:
+            hashes = self.hashes
+            frame = min(range(8), key=hashes.__getitem__)
+            return (hashes[frame] ^ self.zobrist_search[algo][h], frame)
+        return (self.hash ^ self.zobrist_search[algo][h], 0)
+
+    def candidate_moves(self, first=None):
+        # empty cells in search order, the stored best move of the position (if any) goes first
+        if self.live is not None:
+            cells = self.live.cells()
+            if first is not None and first in cells:
+                yield first
+            for cell in cells:
+                if cell != first:
+                    yield cell
+            return
+        if first is not None and self.current_state[first[0]][first[1]] == '.':
+            yield first
+        for i in range(0, self.board_size):
+            for j in range(0, self.board_size):
+                if self.current_state[i][j] == '.' and (i, j) != first:
+                    yield (i, j)
+
+    def is_end_at(self, x, y):
+        # same result as is_end(), assuming the position was not over before (x, y) was played:
+        # a new win can only be on one of the four lines going through the last move
+        char = self.current_state[x][y]
+        for (dx, dy) in self.DIRECTIONS:
+            count = 1
+            i = x + dx
+            j = y + dy
+            while 0 <= i < self.board_size and 0 <= j < self.board_size and self.current_state[i][j] == char:
+                count += 1
+                i += dx
+                j += dy
+            i = x - dx
+            j = y - dy
+            while 0 <= i < self.board_size and 0 <= j < self.board_size and self.current_state[i][j] == char:
+                count += 1
+                i -= dx
+                j -= dy
+            if count >= self.win_size:
+                return char
+
+        # Is whole board full?
+        if self.empty_count == 0:
+            return '.'
+        return None
+
     def check_end(self, trace=False, trace_file=None):
         self.result = self.is_end()
         # Printing the appropriate message if the game has ended
         if self.result != None:
             if self.result == 'X':
                 self.winner = 'X'
-                print('The winner is X!')
-                if (trace):
-                    trace_file.write("The winner is X!")
+                message = 'The winner is X!'
             elif self.result == 'O':
                 self.winner = 'O'
-                print('The winner is O!')
-                if (trace):
-                    trace_file.write("The winner is O!")
+                message = 'The winner is O!'
             elif self.result == '.':
                 self.winner = '.'
-                print("It's a tie!")
-                if (trace):
-                    trace_file.write("It's a tie!")
+                message = "It's a tie!"
+            if self.console:
+                print(message)
+            if (trace):
+                trace_file.write(message)
             self.initialize_game()
         return self.result
 
@@ -183,82 +384,298 @@ class Game:
             value += row_string.count('.')
         return value
 
-    def update_evaluation_stat(self, current_depth = 0):
-        try:
-            self.evaluation_count_by_depth[str(current_depth)] = self.evaluation_count_by_depth.get(str(current_depth)) + 1
-        except TypeError:
-            self.evaluation_count_by_depth[str(current_depth)] = 1
-        try:
-            self.evaluation_count_by_depth_per_round[str(current_depth)] = self.evaluation_count_by_depth_per_round.get(str(current_depth)) + 1
-        except TypeError:
-            self.evaluation_count_by_depth_per_round[str(current_depth)] = 1
-        self.evaluation_count_per_round +=1
-        self.evaluation_count += 1
-
-    def minimax(self, max=False, current_depth=0, currentX=0, currentY=0, h=0, startTime=0, currentTime = 0, max_depth = -1):
+    @property
+    def evaluation_count(self):
+        return self.stats.totals().evaluation_count() if self.stats is not None else 0
+
+    @property
+    def evaluation_count_by_depth(self):
+        return self.stats.totals().evaluation_count_by_depth() if self.stats is not None else {}
+
+    def search(self, algo=ALPHABETA, max=False, h=0, startTime=0, max_depth=-1):
+        # one search from the root, reported to the stats callback (if any) once it is over.
+        # iterative_deepening() runs the threat search itself, once for all its depths
+        triplet = None
+        defense = None
+        if self.threats is not None and self.deadline is None:
+            triplet = self.threats.search(max, startTime)
+            defense = self.threats.defense
+        if triplet is None:
+            if algo == self.MCTS:
+                # MCTS plays the game out, it has no use for a depth or a heuristic
+                if self.mcts is None:
+                    self.mcts = MonteCarloTreeSearch(self)
+                triplet = self.mcts.search(max, startTime)
+            else:
+                key = self.solved_key(algo, max, h, max_depth) if self.solved is not None else None
+                if key is not None:
+                    triplet = self.solved.lookup(key)
+                if triplet is None:
+                    # the only defense the threat search found is not proven, the search tries it first and decides
+                    if defense is not None:
+                        self.root_move = defense
+                    if algo == self.MINIMAX:
+                        triplet = self.minimax(max=max, h=h, startTime=startTime, max_depth=max_depth)
+                    else:
+                        triplet = self.alphabeta(max=max, h=h, startTime=startTime, max_depth=max_depth)
+                    if defense is not None:
+                        self.root_move = None
+                    # a search cut short by the time limit (or the deadline) is not the result of its depth
+                    if key is not None and not self.search_aborted and not self.tt_timed_out and (h == 0 or self.deadline is not None or time.time() - startTime < self.t - 0.15):
+                        self.solved.store(key, triplet)
+        if self.stats is not None:
+            self.stats.end_search({'algo': algo, 'max': max, 'h': h, 'max_depth': max_depth, 'result': triplet})
+        return triplet
+
+    def solved_key(self, algo, max, h, max_depth):
+        # solved cache key of a search from the current position, max_depth as search() gets it
+        if max_depth == -1:
+            max_depth = self.max_depth_O if max else self.max_depth_X
+            max_depth = min(max_depth, self.calculate_current_max_depth())
+        options = sorted((name, value) for (name, value) in self.options.items() if name not in self.NEUTRAL_OPTIONS)
+        board = ''.join(''.join(column) for column in self.current_state)
+        # with a deadline a search without heuristic stops at the depth, without one it plays the game out
+        return SolvedCache.key(self.board_size, self.win_size, sorted(self.blocs_positions), board, max, max_depth, algo, h,
+                               self.deadline is not None, options)
+
+    def prepare_search(self, max=False, h=0):
+        # set up the state the search then keeps up to date move by move
+        self.hash = self.compute_hash(max)
+        if self.symmetry is not None:
+            self.node_symmetries[0] = self.symmetry.board_symmetries(self.current_state) if h != 1 else []
+        if self.book is not None:
+            n = self.board_size
+            self.book_key = 0
+            for i in range(0, n):
+                for j in range(0, n):
+                    if self.current_state[i][j] == 'X':
+                        self.book_key |= 1 << (i * n + j)
+                    elif self.current_state[i][j] == 'O':
+                        self.book_key |= 1 << (n * n + i * n + j)
+            # the book positions have X to move when both players have played as many moves
+            x_count = bin(self.book_key & ((1 << (n * n)) - 1)).count('1')
+            self.book_active = (x_count == bin(self.book_key >> (n * n)).count('1')) == (not max)
+        if self.canonical_tt:
+            for k in range(8):
+                self.hashes[k] = self.zobrist_turn if max else 0
+            for i in range(0, self.board_size):
+                for j in range(0, self.board_size):
+                    if self.current_state[i][j] != '.':
+                        z = self.zobrist_sym[self.current_state[i][j]][i][j]
+                        for k in range(8):
+                            self.hashes[k] ^= z[k]
+        self.tt_timed_out = False
+        if self.incremental_eval:
+            self.init_line_counts()
+        if self.batch is not None:
+            self.batch.load(self.current_state)
+        if self.live is not None:
+            self.live.load(self.current_state, h)
+
+    def root_moves(self, algo=ALPHABETA, h=0):
+        # moves of the root in the order the serial search tries them
+        tt_move = None
+        if self.tt is not None and self.bitboard is None:
+            (key, frame) = self.tt_key(algo, h)
+            entry = self.tt.probe(key)
+            if entry is not None:
+                tt_move = self.symmetry.transform_move(self.symmetry.inverse[frame], entry[4]) if frame else entry[4]
+        if self.root_move is not None:
+            tt_move = self.root_move
+        if algo == self.ALPHABETA and self.ordering is not None:
+            moves = self.ordering.order(list(self.candidate_moves()), 0, tt_move)
+        else:
+            moves = list(self.candidate_moves(tt_move))
+        if self.node_symmetries[0]:
+            moves = self.symmetry.unique_moves(moves, self.node_symmetries[0])
+        return moves
+
+    def search_root_move(self, algo, max, h, i, j, startTime=0, max_depth=0, alpha=np.inf, beta=-np.inf):
+        # value of the child of the root reached by playing (i, j), searched exactly like the root loop would
+        self.prepare_search(max, h)
+        if self.symmetry is not None and h != 1:
+            self.current_state[i][j] = 'O' if max else 'X'
+            self.node_symmetries[1] = self.symmetry.board_symmetries(self.current_state)
+            self.current_state[i][j] = '.'
+        if self.bitboard is not None:
+            bitboard = self.bitboard
+            bitboard.load(self.current_state)
+            cell = i * self.board_size + j
+            if max:
+                bitboard.o_bits |= 1 << cell
+            else:
+                bitboard.x_bits |= 1 << cell
+            bitboard.empty_count -= 1
+            if algo == self.MINIMAX:
+                (v, _, _) = bitboard.minimax(max=not max, current_depth=1, current_cell=cell if max else 0, h=h, startTime=startTime, max_depth=max_depth, last_cell=cell)
+            else:
+                (v, _, _) = bitboard.alphabeta(alpha, beta, max=not max, current_depth=1, h=h, startTime=startTime, max_depth=max_depth, last_cell=cell)
+            return v
+
+        self.make_move(i, j, 'O' if max else 'X')
+        if algo == self.MINIMAX:
+            if max:
+                (v, _, _) = self.minimax(max=False, current_depth=1, currentX=i, currentY=j, h=h, startTime=startTime, max_depth=max_depth, lastX=i, lastY=j)
+            else:
+                (v, _, _) = self.minimax(max=True, current_depth=1, h=h, startTime=startTime, max_depth=max_depth, lastX=i, lastY=j)
+        else:
+            (v, _, _) = self.alphabeta(alpha, beta, max=not max, current_depth=1, h=h, startTime=startTime, max_depth=max_depth, lastX=i, lastY=j)
+        self.undo_move(i, j)
+        return v
+
+    def worker_options(self):
+        # constructor arguments of a copy of this game that searches in a worker process
+        options = dict(self.options)
+        options['workers'] = 1
+        options['iterative'] = False
+        options.update(board_size=self.board_size, bloc_num=self.bloc_num, blocs_positions=self.blocs_positions, win_size=self.win_size, t=self.t,
+                       max_depth_X=self.max_depth_X, max_depth_O=self.max_depth_O, seed=self.seed)
+        return options
+
+    def close(self):
+        # stop the worker processes and the pondering thread, if any, and add the solved cache counts to its file
+        if self.parallel is not None:
+            self.parallel.close()
+        if self.ponderer is not None:
+            self.ponderer.stop()
+        if self.solved is not None:
+            self.solved.close()
+
+    def minimax(self, max=False, current_depth=0, currentX=0, currentY=0, h=0, startTime=0, currentTime = 0, max_depth = -1, lastX=None, lastY=None):
         # Maximizing for 'X' and minimizing for 'O'
         # Possible values are:
         # 10^win_size - win for 'X'
         # 0  - a tie
         # -10^win_size  - loss for 'X'
         # We're initially setting it to 2*10^win_size or -2*10^win_size as worse than the worst case:
-        currentTime = time.time()
+        if self.deadline is None:
+            currentTime = time.time()
         if max_depth == -1:
             max_depth = self.max_depth_X
             if max:
                 max_depth = self.max_depth_O
             if max_depth > self.calculate_current_max_depth():
                 max_depth = self.calculate_current_max_depth()
-        
+        if current_depth == 0:
+            self.prepare_search(max, h)
+            if self.book_active:
+                entry = self.book.lookup(self.book_key)
+                if entry is not None:
+                    return entry
+            if self.parallel is not None:
+                return self.parallel.search(self.MINIMAX, max=max, h=h, startTime=startTime, max_depth=max_depth)
+        if self.bitboard is not None and current_depth == 0:
+            self.bitboard.load(self.current_state)
+            return self.bitboard.minimax(max=max, h=h, startTime=startTime, max_depth=max_depth)
+        if self.stack is not None and current_depth == 0 and self.stack.supported():
+            return self.stack.search(False, max=max, h=h, startTime=startTime, max_depth=max_depth)
+        stats = self.stats
+        if stats is not None:
+            stats.nodes[current_depth] += 1
+
         value = -2 * pow(10, self.win_size)
         if max:
             value = 2 * pow(10, self.win_size)
 
         x = None
         y = None
+        if self.deadline is not None and self.out_of_time():
+            return (value, x, y)
 
-        result = self.is_end()
+        if self.incremental_end and lastX is not None:
+            result = self.is_end_at(lastX, lastY)
+        else:
+            result = self.is_end()
+        if result is not None and stats is not None:
+            stats.leaves[current_depth] += 1
+            stats.terminals[current_depth] += 1
         if result == 'X':
-            self.update_evaluation_stat(current_depth=current_depth)
             return (1 * pow(10, self.win_size), x, y)
         elif result == 'O':
-            self.update_evaluation_stat(current_depth=current_depth)
             return (-1 * pow(10, self.win_size), x, y)
         elif result == '.':
-            self.update_evaluation_stat(current_depth=current_depth)
             return (0, x, y)
+        if h == 0 and self.book_active and current_depth > 0:
+            entry = self.book.lookup(self.book_key)
+            if entry is not None:
+                if stats is not None:
+                    stats.leaves[current_depth] += 1
+                return entry
         # if result is not any of the ending condition, calculate the heuristic value and return
-        if current_depth == max_depth or currentTime - startTime >= self.t - 0.15:
+        if current_depth == max_depth or (self.deadline is None and currentTime - startTime >= self.t - 0.15):
+            if current_depth != max_depth and h != 0:
+                self.tt_timed_out = True
+            if stats is not None and (h != 0 or self.deadline is not None):
+                stats.leaves[current_depth] += 1
             if h == 1:
-                h_value = self.heuristic1_eval(x=currentX, y=currentY)
-                self.update_evaluation_stat(current_depth=current_depth)
-                return (h_value, x, y)
+                return (self.heuristic1_eval(x=currentX, y=currentY), x, y)
             elif h == 2:
-                h_value = self.heuristic2_eval()
-                self.update_evaluation_stat(current_depth=current_depth)
-                return (h_value, x, y)
-
-        for i in range(0, self.board_size):
-            for j in range(0, self.board_size):
-                if self.current_state[i][j] == '.':
-                    if max:
-                        self.current_state[i][j] = 'O'
-                        (v, _, _) = self.minimax(max=False, current_depth=current_depth + 1, currentX=i, currentY=j, h=h, startTime=startTime, currentTime = time.time(), max_depth=max_depth)
-                        if v < value:
-                            value = v
-                            x = i
-                            y = j
-                    else:
-                        self.current_state[i][j] = 'X'
-                        (v, _, _) = self.minimax(max=True, current_depth=current_depth + 1, h=h, startTime=startTime, currentTime = time.time(), max_depth=max_depth)
-                        if v > value:
-                            value = v
-                            x = i
-                            y = j
-                    self.current_state[i][j] = '.'
+                return (self.e2_total if self.incremental_eval else self.heuristic2_eval(), x, y)
+            elif self.deadline is not None:
+                # iterative deepening needs a horizon even without a heuristic, score it as even
+                return (0, x, y)
+
+        # without a heuristic the search only stops at the end of the game
+        depth = self.empty_count if (h == 0 and self.deadline is None) else max_depth - current_depth
+        key = self.hash ^ self.zobrist_search[0][h]
+        frame = 0
+        if self.canonical_tt and h != 1:
+            (key, frame) = self.tt_key(0, h)
+        tt_move = None
+        if self.tt is not None:
+            entry = self.tt.probe(key)
+            if entry is not None:
+                tt_move = self.symmetry.transform_move(self.symmetry.inverse[frame], entry[4]) if frame else entry[4]
+                if entry[1] >= depth and current_depth > 0:
+                    return (entry[2], tt_move[0], tt_move[1])
+        if current_depth == 0 and self.root_move is not None:
+            tt_move = self.root_move
+
+        moves = self.candidate_moves(tt_move)
+        symmetries = self.node_symmetries[current_depth]
+        if symmetries:
+            moves = self.symmetry.unique_moves(moves, symmetries)
+        elif self.symmetry is not None:
+            self.node_symmetries[current_depth + 1] = []
+        values = None
+        if self.batch is not None and h != 0 and current_depth + 1 == max_depth:
+            # every child is a leaf, score them all at once (heuristic1 looks at the move only after an O move)
+            moves = list(moves)
+            values = self.batch.evaluate(moves, 'O' if max else 'X', h, h1_at_move=max, last_empty=self.empty_count == 1)
+            if stats is not None:
+                self.batch_stat(values, current_depth + 1)
+            values = iter(values)
+        for (i, j) in moves:
+            if symmetries:
+                self.node_symmetries[current_depth + 1] = self.symmetry.stabilizer(symmetries, i * self.board_size + j)
+            if values is not None:
+                v = next(values)
+            elif max:
+                self.make_move(i, j, 'O')
+                (v, _, _) = self.minimax(max=False, current_depth=current_depth + 1, currentX=i, currentY=j, h=h, startTime=startTime, max_depth=max_depth, lastX=i, lastY=j)
+                self.undo_move(i, j)
+            else:
+                self.make_move(i, j, 'X')
+                (v, _, _) = self.minimax(max=True, current_depth=current_depth + 1, h=h, startTime=startTime, max_depth=max_depth, lastX=i, lastY=j)
+                self.undo_move(i, j)
+            if max:
+                if v < value:
+                    value = v
+                    x = i
+                    y = j
+            else:
+                if v > value:
+                    value = v
+                    x = i
+                    y = j
+            if self.search_aborted:
+                break
+        # values cut short by the time limit are not stored
+        if self.tt is not None and not self.tt_timed_out:
+            self.tt.store(key, depth, value, TranspositionTable.EXACT, self.symmetry.transform_move(frame, (x, y)) if frame and x is not None else (x, y))
         return (value, x, y)
 
-    def alphabeta(self, alpha=np.Inf, beta=-1 * np.Inf, max=False, current_depth=0, currentX=0, currentY=0, h=0, startTime=0, currentTime = 0, max_depth = -1):
+    def alphabeta(self, alpha=np.Inf, beta=-1 * np.Inf, max=False, current_depth=0, currentX=0, currentY=0, h=0, startTime=0, currentTime = 0, max_depth = -1, lastX=None, lastY=None):
         # Minimizing for 'X' and maximizing for 'O'
         # Possible values are:
         # 10^win_size - win for 'X'
@@ -271,91 +688,239 @@ class Game:
                 max_depth = self.max_depth_O
             if max_depth > self.calculate_current_max_depth():
                 max_depth = self.calculate_current_max_depth()
+        if current_depth == 0:
+            self.prepare_search(max, h)
+            # iterative deepening keeps the killers and history between depths
+            if self.ordering is not None and self.deadline is None:
+                self.ordering.new_search()
+            if self.book_active:
+                entry = self.book.lookup(self.book_key)
+                if entry is not None:
+                    return entry
+            if self.parallel is not None:
+                return self.parallel.search(self.ALPHABETA, max=max, h=h, startTime=startTime, max_depth=max_depth)
+            if self.pvs is not None:
+                return self.pvs.search(max=max, h=h, startTime=startTime, max_depth=max_depth)
+        if self.bitboard is not None and current_depth == 0:
+            self.bitboard.load(self.current_state)
+            return self.bitboard.alphabeta(alpha, beta, max=max, h=h, startTime=startTime, currentTime=currentTime, max_depth=max_depth)
+        if self.stack is not None and current_depth == 0 and self.stack.supported():
+            return self.stack.search(True, max=max, h=h, startTime=startTime, max_depth=max_depth, alpha=alpha, beta=beta)
+        if current_depth > 0 and self.deadline is None:
+            currentTime = time.time()
+        stats = self.stats
+        if stats is not None:
+            stats.nodes[current_depth] += 1
 
         value = -2 * pow(10, self.win_size)
         if max:
             value = 2 * pow(10, self.win_size)
         x = None
         y = None
+        if self.deadline is not None and self.out_of_time():
+            return (value, x, y)
 
-        result = self.is_end()
+        if self.incremental_end and lastX is not None:
+            result = self.is_end_at(lastX, lastY)
+        else:
+            result = self.is_end()
+        if result is not None and stats is not None:
+            stats.leaves[current_depth] += 1
+            stats.terminals[current_depth] += 1
         if result == 'X':
-            self.update_evaluation_stat(current_depth=current_depth)
             return (1 * pow(10, self.win_size), x, y)
         elif result == 'O':
-            self.update_evaluation_stat(current_depth=current_depth)
             return (-1 * pow(10, self.win_size), x, y)
         elif result == '.':
-            self.update_evaluation_stat(current_depth=current_depth)
             return (0, x, y)
+        if h == 0 and self.book_active and current_depth > 0:
+            entry = self.book.lookup(self.book_key)
+            if entry is not None:
+                if stats is not None:
+                    stats.leaves[current_depth] += 1
+                return entry
         # if result is not any of the ending condition, calculate the heuristic value and return
-        if current_depth == max_depth or currentTime - startTime >= self.t - 0.15:
+        if current_depth == max_depth or (self.deadline is None and currentTime - startTime >= self.t - 0.15):
+            if current_depth != max_depth and h != 0:
+                self.tt_timed_out = True
+            if stats is not None and (h != 0 or self.deadline is not None):
+                stats.leaves[current_depth] += 1
             if h == 1:
-                h_value = self.heuristic1_eval(x=currentX, y=currentY)
-                self.update_evaluation_stat(current_depth=current_depth)
-                return (h_value, x, y)
+                return (self.heuristic1_eval(x=currentX, y=currentY), x, y)
             elif h == 2:
-                h_value = self.heuristic2_eval()
-                self.update_evaluation_stat(current_depth=current_depth)
-                return (h_value, x, y)
-
-        for i in range(0, self.board_size):
-            for j in range(0, self.board_size):
-                if self.current_state[i][j] == '.':
-                    if max:
-                        self.current_state[i][j] = 'O'
-                        (v, _, _) = self.alphabeta(alpha, beta, max=False, current_depth=current_depth + 1, h=h, startTime=startTime, currentTime = time.time(), max_depth=max_depth)
-                        if v < value:
-                            value = v
-                            x = i
-                            y = j
-                    else:
-                        self.current_state[i][j] = 'X'
-                        (v, _, _) = self.alphabeta(alpha, beta, max=True, current_depth=current_depth + 1, h=h, startTime=startTime, currentTime = time.time(), max_depth=max_depth)
-                        if v > value:
-                            value = v
-                            x = i
-                            y = j
-                    self.current_state[i][j] = '.'
-                    if max:
-                        if value <= beta:
-                            return (value, x, y)
-                        if value < alpha:
-                            alpha = value
-                    else:
-                        if value >= alpha:
-                            return (value, x, y)
-                        if value > beta:
-                            beta = value
+                return (self.e2_total if self.incremental_eval else self.heuristic2_eval(), x, y)
+            elif self.deadline is not None:
+                # iterative deepening needs a horizon even without a heuristic, score it as even
+                return (0, x, y)
+
+        # without a heuristic the search only stops at the end of the game
+        depth = self.empty_count if (h == 0 and self.deadline is None) else max_depth - current_depth
+        key = self.hash ^ self.zobrist_search[1][h]
+        frame = 0
+        if self.canonical_tt and h != 1:
+            (key, frame) = self.tt_key(1, h)
+        tt_move = None
+        if self.tt is not None:
+            entry = self.tt.probe(key)
+            if entry is not None:
+                tt_move = self.symmetry.transform_move(self.symmetry.inverse[frame], entry[4]) if frame else entry[4]
+                if entry[1] >= depth and current_depth > 0:
+                    if entry[3] == TranspositionTable.EXACT or (entry[3] == TranspositionTable.LOWER and entry[2] >= alpha) or (entry[3] == TranspositionTable.UPPER and entry[2] <= beta):
+                        return (entry[2], tt_move[0], tt_move[1])
+        if current_depth == 0 and self.root_move is not None:
+            tt_move = self.root_move
+        # window of this node: beta is the lower bound (X), alpha the upper bound (O)
+        lower = beta
+        upper = alpha
+
+        if self.ordering is not None:
+            moves = self.ordering.order(list(self.candidate_moves()), current_depth, tt_move)
+        else:
+            moves = self.candidate_moves(tt_move)
+        symmetries = self.node_symmetries[current_depth]
+        if symmetries:
+            moves = self.symmetry.unique_moves(moves, symmetries)
+        elif self.symmetry is not None:
+            self.node_symmetries[current_depth + 1] = []
+        values = None
+        if self.batch is not None and h != 0 and current_depth + 1 == max_depth:
+            # every child is a leaf, score them all at once and only run the cutoff logic over the values
+            moves = list(moves)
+            values = self.batch.evaluate(moves, 'O' if max else 'X', h, last_empty=self.empty_count == 1)
+            if stats is not None:
+                self.batch_stat(values, current_depth + 1)
+            values = iter(values)
+        for (index, (i, j)) in enumerate(moves):
+            if symmetries:
+                self.node_symmetries[current_depth + 1] = self.symmetry.stabilizer(symmetries, i * self.board_size + j)
+            if values is not None:
+                v = next(values)
+            elif max:
+                self.make_move(i, j, 'O')
+                (v, _, _) = self.alphabeta(alpha, beta, max=False, current_depth=current_depth + 1, h=h, startTime=startTime, max_depth=max_depth, lastX=i, lastY=j)
+                self.undo_move(i, j)
+            else:
+                self.make_move(i, j, 'X')
+                (v, _, _) = self.alphabeta(alpha, beta, max=True, current_depth=current_depth + 1, h=h, startTime=startTime, max_depth=max_depth, lastX=i, lastY=j)
+                self.undo_move(i, j)
+            if max:
+                if v < value:
+                    value = v
+                    x = i
+                    y = j
+            else:
+                if v > value:
+                    value = v
+                    x = i
+                    y = j
+            if self.search_aborted:
+                break
+            if max:
+                if value <= beta:
+                    if self.ordering is not None:
+                        self.ordering.cutoff((i, j), current_depth, depth)
+                    if stats is not None:
+                        stats.cutoffs[current_depth] += 1
+                        stats.cutoff_moves[index] += 1
+                    break
+                if value < alpha:
+                    alpha = value
+            else:
+                if value >= alpha:
+                    if self.ordering is not None:
+                        self.ordering.cutoff((i, j), current_depth, depth)
+                    if stats is not None:
+                        stats.cutoffs[current_depth] += 1
+                        stats.cutoff_moves[index] += 1
+                    break
+                if value > beta:
+                    beta = value
+        # values cut short by the time limit are not stored
+        if self.tt is not None and not self.tt_timed_out:
+            if value <= lower:
+                bound = TranspositionTable.UPPER
+            elif value >= upper:
+                bound = TranspositionTable.LOWER
+            else:
+                bound = TranspositionTable.EXACT
+            self.tt.store(key, depth, value, bound, self.symmetry.transform_move(frame, (x, y)) if frame and x is not None else (x, y))
         return (value, x, y)
 
-    def play(self, algo1=None, algo2=None, player_x=None, player_o=None, heuristic_x=0, heuristic_o=0):
-        trace = False
-        trace_file = None
+    def batch_stat(self, values, depth):
+        # children scored by BatchEval are counted like searched leaves, wins and the last empty cell as terminal
+        stats = self.stats
+        win_value = pow(10, self.win_size)
+        stats.nodes[depth] += len(values)
+        stats.leaves[depth] += len(values)
+        stats.terminals[depth] += len(values) if self.empty_count == 1 else sum(1 for v in values if v == win_value or v == -win_value)
+
+    def out_of_time(self):
+        # only look at the clock every CLOCK_INTERVAL nodes, once the deadline is hit every node returns
+        self.node_count += 1
+        if self.node_count % self.CLOCK_INTERVAL == 0 and time.time() >= self.deadline:
+            self.search_aborted = True
+            # values of an unfinished search must not end up in the transposition table
+            self.tt_timed_out = True
+        return self.search_aborted
+
+    def iterative_deepening(self, algo=ALPHABETA, max=False, h=0, first=None):
+        # search depth 1, 2, 3, ... and return the result of the deepest search that finished before the deadline,
+        # the best move of the previous depth is searched first (first, e.g. a pondered move, at depth 1)
+        start = time.time()
+        max_depth = self.max_depth_X
+        if max:
+            max_depth = self.max_depth_O
+        if max_depth > self.calculate_current_max_depth():
+            max_depth = self.calculate_current_max_depth()
+        if max_depth < 1:
+            max_depth = 1
+
+        triplet = self.threats.search(max, start) if self.threats is not None else None
+        if triplet is not None:
+            return triplet
+        # the only defense against a forced win of the other side (if any) is searched first at depth 1
+        self.root_move = self.threats.defense if self.threats is not None else None
+        if self.root_move is None:
+            self.root_move = first
+        self.node_count = 0
+        if self.ordering is not None:
+            self.ordering.new_search()
+        for depth in range(1, max_depth + 1):
+            depth_start = time.time()
+            # depth 1 always runs to the end so there is a move to play
+            self.deadline = float('inf') if depth == 1 else start + self.t - 0.15
+            self.search_aborted = False
+            result = self.search(algo, max=max, h=h, startTime=start, max_depth=depth)
+            if self.search_aborted:
+                break
+            triplet = result
+            self.root_move = (triplet[1], triplet[2])
+            # the next depth takes at least as long as this one, don't start it if it cannot finish
+            if time.time() + (time.time() - depth_start) >= start + self.t - 0.15:
+                break
+
+        self.deadline = None
+        self.root_move = None
+        self.search_aborted = False
+        return triplet
+
+    def trace_file_name(self):
+        extension = ".jsonl" if self.trace_format == 'jsonl' else ".txt"
+        return "gameTrace-" + str(self.board_size) + str(self.bloc_num) + str(self.win_size) + str(self.t) + extension + (".gz" if self.trace_gzip else "")
+
+    def play(self, algo1=None, algo2=None, player_x=None, player_o=None, heuristic_x=0, heuristic_o=0, trace_file=None):
+        trace = None
+        # the trace goes to trace_file if one is given (and is left open), otherwise it is appended to the gameTrace file
+        own_trace_file = trace_file is None
+        # quiet games between two AIs print nothing
+        self.console = not (self.quiet and player_x == self.AI and player_o == self.AI)
 
         # only trace to file if it's AI vs AI
         if (player_x == self.AI and player_o == self.AI):
-            trace = True
-            trace_file_name = "gameTrace-" + str(self.board_size) + str(self.bloc_num) + str(self.win_size) + str(self.t) + ".txt"
-            trace_file = open(trace_file_name, 'a')
-            trace_file.write("\n==================================================================================\n\n")
-            trace_file.write("n=" + str(self.board_size) + " ")
-            trace_file.write("b=" + str(self.bloc_num) + " ")
-            trace_file.write("s=" + str(self.win_size) + " ")
-            trace_file.write("t=" + str(self.t) + "\n")
-            trace_file.write("blocs=" + str(self.blocs_positions) + "\n")
-            trace_file.write("Player 1: AI ")
-            trace_file.write("d=" + str(self.max_depth_X))
-            if (algo1==self.MINIMAX):
-                trace_file.write(" a=False e1(regular)\n")
-            else:
-                trace_file.write(" a=True e1(regular)\n")
-            trace_file.write("Player 2: AI ")
-            trace_file.write("d=" + str(self.max_depth_O))
-            if (algo2==self.MINIMAX):
-                trace_file.write(" a=False e2(defensive)\n")
-            else:
-                trace_file.write(" a=True e2(defensive)\n")
+            if own_trace_file:
+                trace_file = open_trace(self.trace_file_name())
+            trace = TRACE_FORMATS[self.trace_format](trace_file)
+            trace.header(self, algo1, algo2, heuristic_x, heuristic_o)
 
         # default players if not specified
         if player_x == None:
@@ -365,84 +930,158 @@ class Game:
 
         # main game loop
         while True:
-            if trace and self.all_evaluation_run_time!=[]:
-                trace_file.write("\n")
-                trace_file.write("i\tAverage evaluation time(s): " + str(np.average(self.all_evaluation_run_time_per_round)) + "\n")
-                trace_file.write("ii\tHeuristic evaluations: " + str(self.evaluation_count_per_round) + "\n")
-                trace_file.write("iii\tEvaluations by depth: " + str(self.evaluation_count_by_depth_per_round) + "\n")
-                trace_file.write("iv\tAverage evaluation depth: " + str(np.average(list(map(int, self.evaluation_count_by_depth_per_round.keys())))) + "\n")
-                self.evaluation_count_per_round = 0
-                self.all_evaluation_run_time_per_round = []
-                self.evaluation_count_by_depth_per_round = {}
-
-            self.draw_board(trace=trace, trace_file=trace_file)
+            if trace is not None and self.evaluation_times.count > 0:
+                tt_count = None
+                if self.tt is not None:
+                    tt_count = [self.tt.hits, self.tt.misses, self.tt.collisions]
+                    self.tt_count = [self.tt_count[0] + self.tt.hits, self.tt_count[1] + self.tt.misses, self.tt_count[2] + self.tt.collisions]
+                    self.tt.reset_stats()
+                trace.stats(self.round_evaluation_times, self.stats.end_round() if self.stats is not None else None, tt_count)
+                self.round_evaluation_times = TimeStats()
+
+            board = self.render_board()
+            if trace is not None:
+                trace.board(self, board)
+            if self.console:
+                print(board, end="")
 
              # if the game is over, stop tracing
-            if self.check_end(trace, trace_file):
-                trace_file.write("\n")
-                trace_file.write("i\tAverage evaluation time(s): " + str(np.average(self.all_evaluation_run_time)) + "\n")
-                trace_file.write("ii\tHeuristic evaluations: " + str(self.evaluation_count) + "\n")
-                trace_file.write("iii\tEvaluations by depth: " + str(self.evaluation_count_by_depth) + "\n")
-                trace_file.write("iv\tAverage evaluation depth: " + str(np.average(list(map(int, self.evaluation_count_by_depth.keys())))) + "\n")
-                trace_file.write("vi\tTotal moves: " + str(self.turn_count) + "\n")
-                trace_file.flush()
-                trace_file.close()
+            if self.check_end():
+                if trace is not None:
+                    trace.end(self, self.result)
+                    trace.stats(self.evaluation_times, self.stats.totals() if self.stats is not None else None,
+                                self.tt_count if self.tt is not None else None, total_moves=self.turn_count)
+                    trace_file.flush()
+                    if own_trace_file:
+                        trace_file.close()
+                self.close()
                 return
         
             start = time.time()
-            if self.player_turn == 'X':
-                if algo1 == self.MINIMAX:
-                    triplet = self.minimax(max=False, h=heuristic_x, startTime=time.time())
+            pondered = None
+            if self.ponderer is not None:
+                if self.player_turn == 'X':
+                    pondered = self.ponderer.result(self.current_state, False, algo1, heuristic_x)
+                else:
+                    pondered = self.ponderer.result(self.current_state, True, algo2, heuristic_o)
+            # a pondered search has a fixed depth: with iterative deepening its move only goes first, the search still
+            # runs until the deadline (on the transposition table the pondering filled)
+            iterative = self.iterative and (algo1 if self.player_turn == 'X' else algo2) != self.MCTS
+            first = None
+            if pondered is not None and iterative:
+                self.ponderer.stop()
+                first = (pondered[1], pondered[2])
+            if pondered is not None and not iterative:
+                (_, x, y) = pondered
+            elif self.player_turn == 'X':
+                if iterative:
+                    (_, x, y) = self.iterative_deepening(algo=algo1, max=False, h=heuristic_x, first=first)
+                elif algo1 == self.MINIMAX:
+                    triplet = self.search(algo1, max=False, h=heuristic_x, startTime=time.time())
                     if triplet == None:
                         continue
                     (_, x, y) = triplet
                 else:
-                    triplet = self.alphabeta(max=False, h=heuristic_x, startTime=time.time())
+                    triplet = self.search(algo1, max=False, h=heuristic_x, startTime=time.time())
                     if triplet == None:
                         continue
                     (m, x, y) = triplet
             else:
-                if algo2 == self.MINIMAX:
-                    triplet = self.minimax(max=True, h=heuristic_o, startTime=time.time())
+                if iterative:
+                    (_, x, y) = self.iterative_deepening(algo=algo2, max=True, h=heuristic_o, first=first)
+                elif algo2 == self.MINIMAX:
+                    triplet = self.search(algo2, max=True, h=heuristic_o, startTime=time.time())
                     if triplet == None:
                         continue
                     (_, x, y) = triplet
                 else:
-                    triplet = self.alphabeta(max=True, h=heuristic_o, startTime=time.time())
+                    triplet = self.search(algo2, max=True, h=heuristic_o, startTime=time.time())
                     if triplet == None:
                         continue
                     (m, x, y) = triplet
             end = time.time()
+            execution_time = round(end - start, 7)
+            ai = (self.player_turn == 'X' and player_x == self.AI) or (self.player_turn == 'O' and player_o == self.AI)
             # if it's human vs human, show recommendation based on `recommand`
-            if (self.player_turn == 'X' and player_x == self.HUMAN) or (
-                    self.player_turn == 'O' and player_o == self.HUMAN):
+            if not ai:
                 if self.recommend:
-                    execution_time = round(end - start, 7)
-                    self.all_evaluation_run_time.append(execution_time)
-                    self.all_evaluation_run_time_per_round.append(execution_time)
+                    self.evaluation_times.add(execution_time)
+                    self.round_evaluation_times.add(execution_time)
                     print(F'Evaluation time: {execution_time}s')
                     print(F'Recommended move: {self.COLUMN[x]}{y}')
+                if self.ponderer is not None:
+                    # expect the recommended move: search the answer of the other player, then the next recommendation
+                    if self.player_turn == 'X':
+                        self.ponderer.start(self.current_state, (x, y), [(True, algo2, heuristic_o), (False, algo1, heuristic_x)])
+                    else:
+                        self.ponderer.start(self.current_state, (x, y), [(False, algo1, heuristic_x), (True, algo2, heuristic_o)])
                 (x, y) = self.input_move()
-            if (self.player_turn == 'X' and player_x == self.AI) or (self.player_turn == 'O' and player_o == self.AI):
-                execution_time = round(end - start, 7)
-                self.all_evaluation_run_time.append(execution_time)
-                self.all_evaluation_run_time_per_round.append(execution_time)
-                print(F'Evaluation time: {execution_time}s')
-                print(F'Player {self.player_turn} under AI control plays: {self.COLUMN[x]}{y}')
+            else:
+                self.evaluation_times.add(execution_time)
+                self.round_evaluation_times.add(execution_time)
+                if self.console:
+                    print(F'Evaluation time: {execution_time}s\nPlayer {self.player_turn} under AI control plays: {self.COLUMN[x]}{y}')
             self.current_state[x][y] = self.player_turn
-            if (trace):
-                if (self.player_turn == 'X' and player_x == self.HUMAN) or (
-                        self.player_turn == 'O' and player_o == self.HUMAN):
-                    trace_file.write(
-                        "\nPlayer " + self.player_turn + " plays: " + str(self.COLUMN[x]) + "" + str(y) + "\n")
-                if (self.player_turn == 'X' and player_x == self.AI) or (
-                        self.player_turn == 'O' and player_o == self.AI):
-                    trace_file.write(
-                        "\nPlayer " + self.player_turn + " plays under AI control: " + str(self.COLUMN[x]) + "" + str(
-                            y) + "\n")
+            self.empty_count -= 1
+            if trace is not None:
+                trace.move(self, x, y, ai, execution_time)
             self.switch_player()
             self.turn_count += 1
 
+    def init_line_tables(self):
+        # the lines heuristic2_eval() scores: every column and row, and the diagonals at least win_size long
+        n = self.board_size
+        lines = [[(x, i) for x in range(n)] for i in range(n)]
+        lines.extend([(i, y) for y in range(n)] for i in range(n))
+        for k in range(-n + 1, n):
+            diag = [(x, x + k) for x in range(n) if 0 <= x + k < n]
+            anti = [(x, n - 1 + k - x) for x in range(n) if 0 <= n - 1 + k - x < n]
+            for line in (diag, anti):
+                if len(line) >= self.win_size:
+                    lines.append(line)
+        self.lines = lines
+        self.cell_lines = [[[] for y in range(n)] for x in range(n)]
+        for (k, line) in enumerate(lines):
+            for (x, y) in line:
+                self.cell_lines[x][y].append(k)
+        # score of a line holding tempx X's and tempo O's
+        self.line_value = [[0] * (n + 1) for _ in range(n + 1)]
+        for tempx in range(n + 1):
+            for tempo in range(n + 1):
+                if tempx > tempo:
+                    self.line_value[tempx][tempo] = pow(10, tempx)
+                elif tempo > tempx:
+                    self.line_value[tempx][tempo] = -pow(10, tempo)
+                elif tempx != 0:
+                    self.line_value[tempx][tempo] = pow(10, tempx)
+        self.line_x = [0] * len(lines)
+        self.line_o = [0] * len(lines)
+        self.e2_total = 0
+
+    def init_line_counts(self):
+        # count the pieces of current_state on every line, done once at the root of a search
+        self.e2_total = 0
+        for (k, line) in enumerate(self.lines):
+            self.line_x[k] = 0
+            self.line_o[k] = 0
+            for (x, y) in line:
+                if self.current_state[x][y] == 'X':
+                    self.line_x[k] += 1
+                elif self.current_state[x][y] == 'O':
+                    self.line_o[k] += 1
+            self.e2_total += self.line_value[self.line_x[k]][self.line_o[k]]
+
+    def update_lines(self, x, y, char, delta):
+        # add (delta=1) or remove (delta=-1) a piece on (x, y) and fix the running heuristic2 total
+        counts = self.line_x if char == 'X' else self.line_o
+        line_x = self.line_x
+        line_o = self.line_o
+        line_value = self.line_value
+        for k in self.cell_lines[x][y]:
+            old = line_value[line_x[k]][line_o[k]]
+            counts[k] += delta
+            self.e2_total += line_value[line_x[k]][line_o[k]] - old
+
     # Heuristic 1: simple heuristic, checks adjacent positions against proposed x, y
     def heuristic1_eval(self, x=0, y=0):
         e1 = 0
@@ -542,8 +1181,38 @@ class Game:
         return e2
 
 
-def combine_dict(d1, d2):
-    return {key: d1.get(key, 0) + d2.get(key, 0) for key in d2}
+ALGORITHM_NAMES = {Game.MINIMAX: "Minimax", Game.ALPHABETA: "Alpha Beta", Game.MCTS: "MCTS"}
+
+
+def play_series_game(settings, buffered=True):
+    # play one quiet AI vs AI game of a series and return what main() needs from it. When buffered (in a worker process)
+    # the trace is kept in memory so the parent can append the traces of all games to the gameTrace file in order
+    (n, b, blocPositions, s, t, d1, d2, a1, a2, h1, h2, solved_cache) = settings
+    g = Game(recommend=True, board_size=n, bloc_num=b, blocs_positions=blocPositions, win_size=s, max_depth_X=d1, max_depth_O=d2, t=t, series=True, quiet=True,
+             solved_cache=solved_cache)
+    trace = None
+    if buffered:
+        trace_file = io.StringIO()
+        g.play(algo1=a1, algo2=a2, player_x=Game.AI, player_o=Game.AI, heuristic_x=h1, heuristic_o=h2, trace_file=trace_file)
+        trace = trace_file.getvalue()
+    else:
+        g.play(algo1=a1, algo2=a2, player_x=Game.AI, player_o=Game.AI, heuristic_x=h1, heuristic_o=h2)
+    return {'winner': g.winner, 'turn_count': g.turn_count, 'evaluation_times': g.evaluation_times, 'stats': g.stats.totals(),
+            'solved': (g.solved.hits, g.solved.misses) if g.solved is not None else (0, 0), 'trace_file_name': g.trace_file_name(), 'trace': trace}
+
+
+def play_series(games, workers=1):
+    # play the games of a series (a list of play_series_game() settings), workers at a time.
+    # Yields the results in game order and appends each game's trace to its gameTrace file as a whole
+    if workers <= 1:
+        for settings in games:
+            yield play_series_game(settings, buffered=False)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(play_series_game, games):
+            with open_trace(result['trace_file_name']) as trace_file:
+                trace_file.write(result['trace'])
+            yield result
 
 
 def main():
@@ -551,8 +1220,12 @@ def main():
     series = (series == 'Y' or series == 'y')
     r = 1
 
+    w = 1
+    solved_cache = None
     if (series):
         r = int(input('enter the number of rounds r: '))
+        w = int(input('enter the number of worker processes to play the games on: '))
+        solved_cache = input('enter a solved position cache file shared by the games (leave empty for none): ').strip() or None
 
     n = int(input('enter the size of the board n: '))
     b = int(input('enter the number of blocs b: '))
@@ -562,8 +1235,8 @@ def main():
     d1 = int(input('Player 1, enter maximum depth d1: '))
     d2 = int(input('Player 2, enter maximum depth d2: '))
 
-    a1 = int(input('enter either minimax (0) or alphabeta (1) for player 1: '))
-    a2 = int(input('enter either minimax (0) or alphabeta (1) for player 2: '))
+    a1 = int(input('enter either minimax (0), alphabeta (1) or MCTS (4) for player 1: '))
+    a2 = int(input('enter either minimax (0), alphabeta (1) or MCTS (4) for player 2: '))
 
     if (not series):
         p1 = int(input('Player 1, enter either AI (2) or Human (3) p1: '))
@@ -602,12 +1275,12 @@ def main():
         scoreboard.write("Bloc Positions: " + str(blocPositions) + "\n")
         scoreboard.write("\nPlayer 1 info: \n")
         scoreboard.write("max depth:\t" + str(d1) + "\n")
-        algoName = "Minimax" if a1 == 0 else "Alpha Beta"
+        algoName = ALGORITHM_NAMES[a1]
         scoreboard.write("algorithm:\t" + str(algoName) + "\n")
         scoreboard.write("heuristic:\te" + str(h1) + "\n")
         scoreboard.write("\nPlayer 2 info: \n")
         scoreboard.write("max depth:\t" + str(d2) + "\n")
-        algoName = "Minimax" if a2 == 0 else "Alpha Beta"
+        algoName = ALGORITHM_NAMES[a2]
         scoreboard.write("algorithm:\t" + str(algoName) + "\n")
         scoreboard.write("heuristic:\te" + str(h2) + "\n")
         scoreboard.flush()
@@ -616,20 +1289,33 @@ def main():
         e1_wins = 0
         e2_wins = 0
 
-        series_all_heuristic_run_times = []
-        series_evaluation_count_by_depths = {}
-        series_heuristic_evaluation_count = 0
-        turn_counts = []
+        series_times = TimeStats()
+        series_stats = Counters(n * n + 2)
+        turn_counts = RunningStats()
+        solved_hits = 0
+        solved_lookups = 0
 
+        games = []
         for i in range(2 * r):
-            g = Game(recommend=True, board_size=n, bloc_num=b, blocs_positions=blocPositions, win_size=s, max_depth_X=d1, max_depth_O=d2, t=t, series=True)
-            g.play(algo1=a1, algo2=a2, player_x=p1, player_o=p2, heuristic_x=h1, heuristic_o=h2)
-            winner = g.winner
+            games.append((n, b, blocPositions, s, t, d1, d2, a1, a2, h1, h2, solved_cache))
+
+            # swap players
+            a_temp = a1
+            a1 = a2
+            a2 = a_temp
+            h_temp = h1
+            h1 = h2
+            h2 = h_temp
+
+        for (i, result) in enumerate(play_series(games, workers=w)):
+            winner = result['winner']
+            print(F'Game {i + 1}/{2 * r}: ' + ("tie" if winner == '.' else F'{winner} wins') + F' in {result["turn_count"]} moves')
 
-            turn_counts.append(g.turn_count)
-            series_heuristic_evaluation_count += g.evaluation_count
-            series_all_heuristic_run_times.extend(g.all_evaluation_run_time)
-            series_evaluation_count_by_depths = combine_dict(g.evaluation_count_by_depth, series_evaluation_count_by_depths) if bool(series_evaluation_count_by_depths) else g.evaluation_count_by_depth
+            turn_counts.add(result['turn_count'])
+            series_stats.merge(result['stats'])
+            series_times.merge(result['evaluation_times'])
+            solved_hits += result['solved'][0]
+            solved_lookups += result['solved'][0] + result['solved'][1]
 
             if i % 2 == 0:
                 if winner == 'X':
@@ -642,25 +1328,21 @@ def main():
                 else:
                     e2_wins += 1
 
-            # swap players
-            a_temp = a1
-            a1 = a2
-            a2 = a_temp
-            h_temp = h1
-            h1 = h2
-            h2 = h_temp
-
         scoreboard = open("scoreboard.txt", "a")
         scoreboard.write("\n\nGames played: " + str(2 * r) + "\n")
         scoreboard.write("e1 win percentage: " + str(100 * e1_wins / (2 * r)) + "%\n")
         scoreboard.write("e2 win percentage: " + str(100 * e2_wins / (2 * r)) + "%\n")
         scoreboard.write("\n")
 
-        scoreboard.write("i\tAverage evaluation time(s): " + str(np.average(series_all_heuristic_run_times)) + "\n")
-        scoreboard.write("ii\tTotal heuristic evaluations: " + str(series_heuristic_evaluation_count) + "\n")
-        scoreboard.write("iii\tEvaluations by depth: " + str(series_evaluation_count_by_depths) + "\n")
-        scoreboard.write("iv\tAverage evaluation depth: " + str(np.average(list(map(int, series_evaluation_count_by_depths)))) + "\n")
-        scoreboard.write("iv\tAverage turn count: " + str(np.average(turn_counts)) +"\n")
+        scoreboard.write("i\tAverage evaluation time(s): " + str(series_times.mean) + "\n")
+        scoreboard.write("i\tEvaluation time percentiles(s): " + format_percentiles(series_times) + "\n")
+        scoreboard.write("ii\tTotal heuristic evaluations: " + str(series_stats.evaluation_count()) + "\n")
+        scoreboard.write("iii\tEvaluations by depth: " + str(series_stats.evaluation_count_by_depth()) + "\n")
+        scoreboard.write("iv\tAverage evaluation depth: " + str(series_stats.average_evaluation_depth()) + "\n")
+        scoreboard.write("iv\tAverage turn count: " + str(turn_counts.mean) +"\n")
+        if solved_cache is not None:
+            scoreboard.write("v\tSolved cache: " + str(solved_hits) + " hits / " + str(solved_lookups) + " searches ("
+                             + str(round(100 * solved_hits / solved_lookups, 1) if solved_lookups else 0) + "%)\n")
         scoreboard.write("\n=============================================\n\n\n")
         scoreboard.flush()
         scoreboard.close()
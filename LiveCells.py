@@ -0,0 +1,109 @@
+from Bitboard import Bitboard
+
+
+class LiveCells:
+    # candidate moves of a position without the dead cells: a cell is live when it is on at least one segment of
+    # win_size cells that one of the players can still fill, i.e. with no bloc (those are not in win_masks) and not
+    # both X and O in it. A dead cell can never be part of a line, playing it only passes the turn, and passing never
+    # does better than playing a live cell, so without heuristic the values of the search do not change. With a
+    # heuristic they would: heuristic2 still counts the pieces of dead cells on its full lines, and heuristic1 the
+    # ones around a cell, so dead cells are only left out of searches without heuristic.
+    # With radius > 0, searches with a heuristic leave out the cells farther than radius (in rows, columns or
+    # diagonals) from every piece instead, an approximation. With radius >= win_size - 1 those cells share no
+    # segment with any piece.
+    # The candidates of every position are cached as (bits, cells, indices), keyed by the X and O bits of the position
+    CACHE_SIZE = 1 << 16
+
+    def __init__(self, game, radius=0):
+        self.game = game
+        self.board_size = game.board_size
+        self.radius = radius
+        n = self.board_size
+        board = game.bitboard if game.bitboard is not None else Bitboard(game)
+        self.win_masks = board.win_masks
+        self.empty_bits = ((1 << (n * n)) - 1) & ~board.bloc_bits
+        # cells within radius of every cell
+        self.near_masks = []
+        for x in range(n):
+            for y in range(n):
+                mask = 0
+                for i in range(x - radius, x + radius + 1):
+                    for j in range(y - radius, y + radius + 1):
+                        if 0 <= i < n and 0 <= j < n:
+                            mask |= 1 << (i * n + j)
+                self.near_masks.append(mask)
+        self.cache = {}
+        # position of the search, kept up to date by Game.make_move()/undo_move()
+        self.x_bits = 0
+        self.o_bits = 0
+        self.h = 0
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, current_state, h=0):
+        n = self.board_size
+        self.x_bits = 0
+        self.o_bits = 0
+        for x in range(n):
+            for y in range(n):
+                if current_state[x][y] == 'X':
+                    self.x_bits |= 1 << (x * n + y)
+                elif current_state[x][y] == 'O':
+                    self.o_bits |= 1 << (x * n + y)
+        self.h = h
+
+    def set(self, i, j, char):
+        bit = 1 << (i * self.board_size + j)
+        if char == 'X':
+            self.x_bits ^= bit
+        else:
+            self.o_bits ^= bit
+
+    def candidates(self, x_bits, o_bits, h):
+        # (bits, cells, indices) of the candidate moves, cells as (x, y) and indices as x * n + y in the board order
+        # of the search.
+        # A position with empty cells but none live is a tie whatever is played, its first empty cell is kept
+        near = self.radius > 0 and h != 0 and (x_bits | o_bits) != 0
+        key = (x_bits, o_bits, h == 0, near)
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        empty = self.empty_bits & ~(x_bits | o_bits)
+        bits = empty
+        if h == 0:
+            live = 0
+            for mask in self.win_masks:
+                if not (mask & x_bits) or not (mask & o_bits):
+                    live |= mask
+            bits &= live
+        if near:
+            reach = 0
+            pieces = x_bits | o_bits
+            while pieces:
+                bit = pieces & -pieces
+                pieces ^= bit
+                reach |= self.near_masks[bit.bit_length() - 1]
+            bits &= reach
+        if not bits:
+            bits = empty & -empty
+        n = self.board_size
+        cells = []
+        indices = []
+        rest = bits
+        while rest:
+            bit = rest & -rest
+            rest ^= bit
+            cell = bit.bit_length() - 1
+            cells.append((cell // n, cell % n))
+            indices.append(cell)
+        if len(self.cache) >= self.CACHE_SIZE:
+            self.cache.clear()
+        entry = (bits, cells, indices)
+        self.cache[key] = entry
+        return entry
+
+    def cells(self):
+        # candidate cells of the position being searched
+        return self.candidates(self.x_bits, self.o_bits, self.h)[1]
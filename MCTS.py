@@ -0,0 +1,226 @@
+import math
+import time
+
+import numpy as np
+
+from Bitboard import Bitboard, popcount
+
+
+class Node:
+    # one position of the tree, reached by player playing cell. wins counts the playouts through it won by player
+    # (a tie counts half), so the parent picks its children by their wins
+    __slots__ = ('cell', 'player', 'parent', 'children', 'untried', 'visits', 'wins', 'mean', 'spread', 'result')
+
+    def __init__(self, cell, player, parent, untried, result):
+        self.cell = cell
+        self.player = player
+        self.parent = parent
+        self.children = []
+        # moves not expanded yet, in random order
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+        # wins / visits and 1 / sqrt(visits), kept up to date by the back up so the selection needs no division or sqrt
+        self.mean = 0.0
+        self.spread = 0.0
+        # 'X', 'O' or '.' when the game is over in this position
+        self.result = result
+
+
+class MonteCarloTreeSearch:
+    # Monte Carlo tree search with UCT selection and random playouts, on the bitmasks of Bitboard.
+    # The tree is kept between the searches of a game, the search goes on from the node of the current position
+    EXPLORATION = math.sqrt(2)
+    # playouts of one search when t leaves no real deadline
+    MAX_PLAYOUTS = 1000000
+
+    def __init__(self, game):
+        self.game = game
+        self.board_size = game.board_size
+        board = game.bitboard if game.bitboard is not None else Bitboard(game)
+        self.cell_win_masks = board.cell_win_masks
+        # all the segments through a cell, a move can only win with at least win_size pieces in there
+        self.cell_reach = []
+        for masks in board.cell_win_masks:
+            reach = 0
+            for mask in masks:
+                reach |= mask
+            self.cell_reach.append(reach)
+        self.cell_count = game.board_size * game.board_size
+        self.cell_bits = [1 << cell for cell in range(self.cell_count)]
+        self.free_cells = np.array([cell for cell in range(self.cell_count) if not (board.bloc_bits >> cell) & 1], dtype=np.int64)
+        self.byte_count = (self.cell_count + 7) // 8
+        self.rng = np.random.default_rng(game.seed)
+        self.root = None
+        self.root_x = 0
+        self.root_o = 0
+        self.playouts = 0
+
+    def empty_cells(self, x_bits, o_bits):
+        # empty cells in random order: the taken bits are unpacked and the free cells filtered and shuffled in numpy,
+        # a third of the time of a python filter and sort on 10x10 boards
+        taken = np.unpackbits(np.frombuffer((x_bits | o_bits).to_bytes(self.byte_count, 'little'), dtype=np.uint8), bitorder='little')
+        cells = self.free_cells[taken[self.free_cells] == 0]
+        self.rng.shuffle(cells)
+        return cells.tolist()
+
+    def wins(self, bits, cell):
+        for mask in self.cell_win_masks[cell]:
+            if bits & mask == mask:
+                return True
+        return False
+
+    def reuse(self, x_bits, o_bits, max):
+        # node of the kept tree that holds the current position, or None.
+        # The moves played since the last search are followed down from its root
+        node = self.root
+        if node is None or self.root_x & ~x_bits or self.root_o & ~o_bits:
+            return None
+        new_x = x_bits & ~self.root_x
+        new_o = o_bits & ~self.root_o
+        while new_x | new_o:
+            bits = new_o if node.player == 'X' else new_x
+            child = next((child for child in node.children if (bits >> child.cell) & 1), None)
+            if child is None:
+                return None
+            if child.player == 'X':
+                new_x ^= 1 << child.cell
+            else:
+                new_o ^= 1 << child.cell
+            node = child
+        if (node.player == 'X') != max:
+            return None
+        node.parent = None
+        return node
+
+    def search(self, max=False, startTime=0):
+        # (value, x, y): the most visited move of the side to move (O if max), the value is its win rate
+        # mapped on -10^win_size (O wins) .. 10^win_size (X wins)
+        game = self.game
+        n = self.board_size
+        x_bits = 0
+        o_bits = 0
+        for x in range(n):
+            for y in range(n):
+                if game.current_state[x][y] == 'X':
+                    x_bits |= 1 << (x * n + y)
+                elif game.current_state[x][y] == 'O':
+                    o_bits |= 1 << (x * n + y)
+        root = self.reuse(x_bits, o_bits, max)
+        if root is None:
+            root = Node(None, 'X' if max else 'O', None, self.empty_cells(x_bits, o_bits), None)
+        self.root = root
+        self.root_x = x_bits
+        self.root_o = o_bits
+
+        deadline = startTime + game.t - 0.15
+        stats = game.stats
+        wins = self.wins
+        cell_win_masks = self.cell_win_masks
+        cell_reach = self.cell_reach
+        cell_bits = self.cell_bits
+        win_size = game.win_size
+        log = math.log
+        sqrt = math.sqrt
+        exploration = self.EXPLORATION
+        playouts = 0
+        while True:
+            node = root
+            x = x_bits
+            o = o_bits
+            depth = 0
+            # selection: the child with the best UCT score until a node with moves left to expand
+            while not node.untried and node.children:
+                scale = exploration * sqrt(log(node.visits))
+                best = None
+                best_score = -1.0
+                for child in node.children:
+                    score = child.mean + scale * child.spread
+                    if score > best_score:
+                        best_score = score
+                        best = child
+                node = best
+                if node.player == 'X':
+                    x |= 1 << node.cell
+                else:
+                    o |= 1 << node.cell
+                depth += 1
+
+            # expansion
+            if node.untried:
+                cell = node.untried.pop()
+                player = 'O' if node.player == 'X' else 'X'
+                if player == 'X':
+                    x |= 1 << cell
+                    result = 'X' if wins(x, cell) else None
+                else:
+                    o |= 1 << cell
+                    result = 'O' if wins(o, cell) else None
+                untried = self.empty_cells(x, o) if result is None else []
+                if result is None and not untried:
+                    result = '.'
+                child = Node(cell, player, node, untried, result)
+                node.children.append(child)
+                node = child
+                depth += 1
+                if stats is not None:
+                    stats.nodes[depth] += 1
+
+            # playout: random moves until a line is made or the board is full. The moves left to expand of the new
+            # node are already in random order, the playout takes them from the front, the expansion from the back
+            # The moves alternate, so the loop takes them two at a time: one for the side to move, one for the other
+            result = node.result
+            if result is None:
+                if node.player == 'O':
+                    (mover, other, mover_wins, other_wins) = (x, o, 'X', 'O')
+                else:
+                    (mover, other, mover_wins, other_wins) = (o, x, 'O', 'X')
+                result = '.'
+                moves = iter(node.untried)
+                for cell in moves:
+                    mover |= cell_bits[cell]
+                    if popcount(mover & cell_reach[cell]) >= win_size:
+                        for mask in cell_win_masks[cell]:
+                            if mover & mask == mask:
+                                result = mover_wins
+                                break
+                        if result != '.':
+                            break
+                    cell = next(moves, None)
+                    if cell is None:
+                        break
+                    other |= cell_bits[cell]
+                    if popcount(other & cell_reach[cell]) >= win_size:
+                        for mask in cell_win_masks[cell]:
+                            if other & mask == mask:
+                                result = other_wins
+                                break
+                        if result != '.':
+                            break
+            if stats is not None:
+                stats.leaves[depth] += 1
+
+            # back up the result
+            while node is not None:
+                node.visits += 1
+                if result == node.player:
+                    node.wins += 1.0
+                elif result == '.':
+                    node.wins += 0.5
+                node.mean = node.wins / node.visits
+                node.spread = 1 / sqrt(node.visits)
+                node = node.parent
+            playouts += 1
+            if time.time() >= deadline or playouts >= self.MAX_PLAYOUTS or game.search_aborted:
+                break
+        self.playouts += playouts
+
+        if not root.children:
+            return (0, None, None)
+        best = root.children[0]
+        for child in root.children:
+            if child.visits > best.visits:
+                best = child
+        rate = best.wins / best.visits
+        value = int(round((2 * rate - 1) * pow(10, game.win_size)))
+        return (-value if max else value, best.cell // n, best.cell % n)
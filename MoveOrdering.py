@@ -0,0 +1,70 @@
+class MoveOrdering:
+    def __init__(self, game, hash_move=True, killers=True, history=True, prior=True):
+        # each source can be turned off on its own to measure what it is worth
+        self.use_hash_move = hash_move
+        self.use_killers = killers
+        self.use_history = history
+        n = game.board_size
+        s = game.win_size
+
+        # two killer moves (moves that caused a cutoff) per ply
+        self.killers = [[None, None] for _ in range(n * n + 1)]
+        # history table: how often (weighted by remaining depth) a cell caused a cutoff
+        self.history = [[0] * n for _ in range(n)]
+
+        # static prior: number of s-length segments through the cell that no bloc cuts off,
+        # plus a small bonus for being close to the center
+        self.prior = [[0] * n for _ in range(n)]
+        if prior:
+            blocs = set((int(bloc[0]), int(bloc[2])) for bloc in game.blocs_positions)
+            for (dx, dy) in game.DIRECTIONS:
+                for x in range(n):
+                    for y in range(n):
+                        if not (0 <= x + (s - 1) * dx < n and 0 <= y + (s - 1) * dy < n):
+                            continue
+                        cells = [(x + k * dx, y + k * dy) for k in range(s)]
+                        if any(cell in blocs for cell in cells):
+                            continue
+                        for (i, j) in cells:
+                            self.prior[i][j] += 4
+            center = (n - 1) / 2
+            for x in range(n):
+                for y in range(n):
+                    self.prior[x][y] += n - int(abs(x - center) + abs(y - center))
+
+    def new_search(self):
+        # killers are only good for the position they were found in, history is aged instead of dropped
+        for killers in self.killers:
+            killers[0] = None
+            killers[1] = None
+        for row in self.history:
+            for j in range(0, len(row)):
+                row[j] //= 2
+
+    def order(self, moves, ply, hash_move=None):
+        # moves is a list of (x, y), returns it with the hash move first, then the killers of this ply,
+        # then everything else by history + prior (ties keep the board order)
+        history = self.history
+        prior = self.prior
+        moves.sort(key=lambda move: -(history[move[0]][move[1]] + prior[move[0]][move[1]]))
+
+        front = []
+        if self.use_hash_move and hash_move is not None and hash_move in moves:
+            front.append(hash_move)
+        if self.use_killers:
+            for killer in self.killers[ply]:
+                if killer is not None and killer not in front and killer in moves:
+                    front.append(killer)
+        if not front:
+            return moves
+        return front + [move for move in moves if move not in front]
+
+    def cutoff(self, move, ply, depth):
+        # called with the move that caused a beta/alpha cutoff
+        if self.use_killers:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        if self.use_history:
+            self.history[move[0]][move[1]] += depth * depth
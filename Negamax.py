@@ -0,0 +1,184 @@
+import time
+
+from TranspositionTable import TranspositionTable
+
+
+class Negamax:
+    # alphabeta() as a negamax principal variation search: one code path for both players (scores are from the side
+    # to move, X's score negated for O), the first move of a node searched with the full window and the others with
+    # a null window, re-searched only when they beat it. Bounds are ints, never np.inf.
+    # The root keeps the move order of alphabeta() and the first move with the best score, and a node that finds
+    # nothing better than -2*10^win_size returns it like alphabeta() does, so the value and move are the same
+    # as alphabeta() with the same options, only with fewer nodes
+    # aspiration window of the root: previous score of the same heuristic +- (|score| / ASPIRATION + 1)
+    ASPIRATION = 4
+
+    def __init__(self, game):
+        self.game = game
+        n = game.board_size
+        self.win_value = pow(10, game.win_size)
+        # alphabeta() starts every node at -2*10^win_size (X) / 2*10^win_size (O)
+        self.floor = 2 * self.win_value
+        # above every score a search can return: heuristic2 scores at most 10^n per line
+        self.infinity = len(game.lines) * pow(10, n) + self.floor + 1
+        # killer moves per ply, used below the root when the game has no MoveOrdering
+        self.killers = [[None, None] for _ in range(n * n + 2)]
+        # root score of the last search per heuristic (from X), the center of the next aspiration window
+        self.scores = {}
+        self.researches = 0
+
+    def search(self, max=False, h=0, startTime=0, max_depth=0):
+        # (value, x, y) of the root, value from X like alphabeta()
+        game = self.game
+        if game.ordering is None and game.deadline is None:
+            for killers in self.killers:
+                killers[0] = None
+                killers[1] = None
+        sign = -1 if max else 1
+        infinity = self.infinity
+        previous = self.scores.get(h)
+        if previous is None:
+            (low, high) = (-infinity, infinity)
+        else:
+            center = sign * previous
+            width = abs(center) // self.ASPIRATION + 1
+            (low, high) = (center - width, center + width)
+        while True:
+            (score, x, y) = self.node(low, high, max, 0, h, startTime, max_depth, None, None)
+            if game.search_aborted:
+                break
+            # outside the window the score is only a bound, search again with that side open
+            if score <= low and low > -infinity:
+                low = -infinity
+            elif score >= high and high < infinity:
+                high = infinity
+            else:
+                break
+            self.researches += 1
+        self.scores[h] = sign * score
+        return (sign * score, x, y)
+
+    def node(self, alpha, beta, max, current_depth, h, startTime, max_depth, lastX, lastY):
+        game = self.game
+        stats = game.stats
+        if stats is not None:
+            stats.nodes[current_depth] += 1
+        best = -self.floor
+        x = None
+        y = None
+        if game.deadline is not None and game.out_of_time():
+            return (best, x, y)
+
+        if game.incremental_end and lastX is not None:
+            result = game.is_end_at(lastX, lastY)
+        else:
+            result = game.is_end()
+        if result is not None:
+            if stats is not None:
+                stats.leaves[current_depth] += 1
+                stats.terminals[current_depth] += 1
+            if result == '.':
+                return (0, x, y)
+            return (self.win_value if (result == 'X') != max else -self.win_value, x, y)
+        if h == 0 and game.book_active and current_depth > 0:
+            entry = game.book.lookup(game.book_key)
+            if entry is not None:
+                if stats is not None:
+                    stats.leaves[current_depth] += 1
+                return (-entry[0] if max else entry[0], entry[1], entry[2])
+        # same horizon as alphabeta(): the depth limit, or the time limit of a search without deadline
+        if current_depth == max_depth or (game.deadline is None and current_depth > 0 and time.time() - startTime >= game.t - 0.15):
+            if current_depth != max_depth and h != 0:
+                game.tt_timed_out = True
+            if stats is not None and (h != 0 or game.deadline is not None):
+                stats.leaves[current_depth] += 1
+            if h == 1:
+                # alphabeta() never passes the move down, heuristic1 is evaluated at (0, 0)
+                value = game.heuristic1_eval(x=0, y=0)
+                return (-value if max else value, x, y)
+            elif h == 2:
+                value = game.e2_total if game.incremental_eval else game.heuristic2_eval()
+                return (-value if max else value, x, y)
+            elif game.deadline is not None:
+                return (0, x, y)
+
+        depth = game.empty_count if (h == 0 and game.deadline is None) else max_depth - current_depth
+        tt = game.tt
+        key = game.hash ^ game.zobrist_search[1][h]
+        tt_move = None
+        if tt is not None:
+            entry = tt.probe(key)
+            if entry is not None:
+                tt_move = entry[4] if entry[4][0] is not None else None
+                if entry[1] >= depth and current_depth > 0:
+                    # entries hold X's value, LOWER/UPPER bound it from X's side
+                    value = -entry[2] if max else entry[2]
+                    bound = entry[3]
+                    if bound != TranspositionTable.EXACT and max:
+                        bound = TranspositionTable.UPPER if bound == TranspositionTable.LOWER else TranspositionTable.LOWER
+                    if bound == TranspositionTable.EXACT or (bound == TranspositionTable.LOWER and value >= beta) or (bound == TranspositionTable.UPPER and value <= alpha):
+                        return (value, entry[4][0], entry[4][1])
+        if current_depth == 0 and game.root_move is not None:
+            tt_move = game.root_move
+
+        if game.ordering is not None:
+            moves = game.ordering.order(list(game.candidate_moves()), current_depth, tt_move)
+        elif current_depth == 0:
+            # the board order of alphabeta(), so ties go to the same move
+            moves = game.candidate_moves(tt_move)
+        else:
+            # below the root: hash move, killers, then the board order
+            moves = list(game.candidate_moves(tt_move))
+            killers = [move for move in self.killers[current_depth] if move is not None and move != tt_move and game.current_state[move[0]][move[1]] == '.']
+            if killers:
+                head = 1 if (tt_move is not None and moves[0] == tt_move) else 0
+                moves = moves[:head] + killers + [move for move in moves[head:] if move not in killers]
+
+        window_low = alpha
+        # -2*10^win_size acts as a first move already searched
+        if best >= beta:
+            return (best, x, y)
+        if best > alpha:
+            alpha = best
+        char = 'O' if max else 'X'
+        for (index, (i, j)) in enumerate(moves):
+            game.make_move(i, j, char)
+            if index == 0:
+                score = -self.node(-beta, -alpha, not max, current_depth + 1, h, startTime, max_depth, i, j)[0]
+            else:
+                score = -self.node(-alpha - 1, -alpha, not max, current_depth + 1, h, startTime, max_depth, i, j)[0]
+                if alpha < score < beta and not game.search_aborted:
+                    score = -self.node(-beta, -score, not max, current_depth + 1, h, startTime, max_depth, i, j)[0]
+            game.undo_move(i, j)
+            if score > best:
+                best = score
+                x = i
+                y = j
+            if game.search_aborted:
+                break
+            if best >= beta:
+                if game.ordering is not None:
+                    game.ordering.cutoff((i, j), current_depth, depth)
+                else:
+                    killers = self.killers[current_depth]
+                    if killers[0] != (i, j):
+                        killers[1] = killers[0]
+                        killers[0] = (i, j)
+                if stats is not None:
+                    stats.cutoffs[current_depth] += 1
+                    stats.cutoff_moves[index] += 1
+                break
+            if best > alpha:
+                alpha = best
+        # values cut short by the time limit are not stored
+        if tt is not None and not game.tt_timed_out:
+            if best <= window_low:
+                bound = TranspositionTable.UPPER
+            elif best >= beta:
+                bound = TranspositionTable.LOWER
+            else:
+                bound = TranspositionTable.EXACT
+            if bound != TranspositionTable.EXACT and max:
+                bound = TranspositionTable.UPPER if bound == TranspositionTable.LOWER else TranspositionTable.LOWER
+            tt.store(key, depth, -best if max else best, bound, (x, y))
+        return (best, x, y)
@@ -0,0 +1,159 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+# book file: header, then the sorted uint64 position keys, the int8 values (1 X wins, -1 O wins, 0 tie)
+# and the uint8 best moves (cell x * n + y) of every position, all little endian
+MAGIC = b'TTTBOOK\0'
+VERSION = 1
+HEADER = struct.Struct('<8sIBBxxQQ')
+
+
+def bloc_bits_of(board_size, blocs_positions):
+    bits = 0
+    for bloc in blocs_positions:
+        bits |= 1 << (int(bloc[0]) * board_size + int(bloc[2]))
+    return bits
+
+
+def file_name(board_size, win_size, bloc_bits):
+    return F'book-{board_size}-{win_size}-{bloc_bits:x}.bin'
+
+
+class OpeningBook:
+    # a solved position table for one (n, s, bloc layout), read from a file generated by solve()/write_book().
+    # The file is only opened (and mapped) on the first lookup, a missing file or one made for another
+    # configuration or format version is never used.
+    # solve() always solves the whole game (--plies only filters its table): 4x4 with s=3 already takes half a minute
+    # and 3.5M positions, a 5x5 book cannot be built in practice
+    MAX_BOARD_SIZE = 4
+
+    def __init__(self, path, game):
+        self.board_size = game.board_size
+        self.win_size = game.win_size
+        self.bloc_bits = bloc_bits_of(game.board_size, game.blocs_positions)
+        if os.path.isdir(path):
+            path = os.path.join(path, file_name(self.board_size, self.win_size, self.bloc_bits))
+        self.path = path
+        self.loaded = False
+        self.keys = None
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        self.loaded = True
+        if self.board_size > self.MAX_BOARD_SIZE or not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as book_file:
+            self.map = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, n, s, bloc_bits, count) = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION or (n, s, bloc_bits) != (self.board_size, self.win_size, self.bloc_bits):
+            print(F'{self.path} is not a book for this game (n={n} s={s} blocs={bloc_bits:x} version {version}), it is not used')
+            self.map.close()
+            return
+        self.keys = np.frombuffer(self.map, dtype='<u8', count=count, offset=HEADER.size)
+        self.values = np.frombuffer(self.map, dtype=np.int8, count=count, offset=HEADER.size + 8 * count)
+        self.moves = np.frombuffer(self.map, dtype=np.uint8, count=count, offset=HEADER.size + 9 * count)
+
+    def lookup(self, key):
+        # (value, x, y) of the position with key x_bits | o_bits << n * n, or None if it is not in the book
+        if not self.loaded:
+            self.load()
+        if self.keys is None:
+            return None
+        k = int(np.searchsorted(self.keys, key))
+        if k == len(self.keys) or self.keys[k] != key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        cell = int(self.moves[k])
+        return (int(self.values[k]) * pow(10, self.win_size), cell // self.board_size, cell % self.board_size)
+
+
+def solve(board_size, win_size, blocs_positions, plies=None):
+    # value and best move of every position that can be reached from the empty board (X first) and is not over yet
+    # (including the ones where a player missed a win, the AIs of a game do not always play the best move),
+    # as {key: (value, cell)}. Values are those of a search without heuristic: 1 X wins, -1 O wins, 0 tie, and the
+    # best move is the first one with the best value in board order, the move Game.minimax()/alphabeta() pick
+    from Bitboard import Bitboard
+    from Game import Game
+
+    game = Game(board_size=board_size, bloc_num=len(blocs_positions), blocs_positions=blocs_positions, win_size=win_size, stats=False)
+    board = Bitboard(game)
+    nn = board_size * board_size
+    cell_win_masks = board.cell_win_masks
+    table = {}
+
+    def wins(bits, cell):
+        for mask in cell_win_masks[cell]:
+            if bits & mask == mask:
+                return True
+        return False
+
+    def search(x_bits, o_bits, x_to_move):
+        key = x_bits | (o_bits << nn)
+        entry = table.get(key)
+        if entry is not None:
+            return entry[0]
+        empty = board.full_mask & ~(x_bits | o_bits | board.bloc_bits)
+        best = -2 if x_to_move else 2
+        best_cell = None
+        for cell in range(nn):
+            bit = 1 << cell
+            if not empty & bit:
+                continue
+            if x_to_move:
+                v = 1 if wins(x_bits | bit, cell) else (search(x_bits | bit, o_bits, False) if empty ^ bit else 0)
+                if v > best:
+                    (best, best_cell) = (v, cell)
+            else:
+                v = -1 if wins(o_bits | bit, cell) else (search(x_bits, o_bits | bit, True) if empty ^ bit else 0)
+                if v < best:
+                    (best, best_cell) = (v, cell)
+        table[key] = (best, best_cell)
+        return best
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 4 * nn + 100))
+    search(0, 0, True)
+    if plies is not None:
+        table = {key: entry for (key, entry) in table.items() if bin(key).count('1') <= plies}
+    return table
+
+
+def write_book(path, board_size, win_size, blocs_positions, table):
+    keys = np.array(sorted(table), dtype='<u8')
+    values = np.array([table[int(key)][0] for key in keys], dtype=np.int8)
+    moves = np.array([table[int(key)][1] for key in keys], dtype=np.uint8)
+    with open(path, 'wb') as book_file:
+        book_file.write(HEADER.pack(MAGIC, VERSION, board_size, win_size, bloc_bits_of(board_size, blocs_positions), len(keys)))
+        book_file.write(keys.tobytes())
+        book_file.write(values.tobytes())
+        book_file.write(moves.tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Solve a small configuration and write its book file.')
+    parser.add_argument('-n', type=int, default=3, help='board size (at most ' + str(OpeningBook.MAX_BOARD_SIZE) + ')')
+    parser.add_argument('-s', type=int, default=3, help='winning line-up size')
+    parser.add_argument('--blocs', nargs='*', default=[], help='bloc positions as "x y"')
+    parser.add_argument('--plies', type=int, help='only keep the positions with at most this many pieces (an opening book)')
+    parser.add_argument('-o', '--output', default='.', help='directory the book file is written to')
+    args = parser.parse_args()
+    if args.n > OpeningBook.MAX_BOARD_SIZE:
+        parser.error('boards bigger than ' + str(OpeningBook.MAX_BOARD_SIZE) + ' have too many positions to be solved')
+
+    start = time.time()
+    table = solve(args.n, min(args.s, args.n), args.blocs, args.plies)
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, file_name(args.n, min(args.s, args.n), bloc_bits_of(args.n, args.blocs)))
+    write_book(path, args.n, min(args.s, args.n), args.blocs, table)
+    print(F'{len(table)} positions written to {path} in {time.time() - start:.1f}s')
+
+
+if __name__ == "__main__":
+    main()
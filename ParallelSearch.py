@@ -0,0 +1,138 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# set in every worker process by init_worker()
+worker_bound = None
+worker_games = {}
+
+
+def init_worker(bound):
+    global worker_bound
+    worker_bound = bound
+
+
+def encode_board(current_state):
+    # one byte per cell ('.', 'X', 'O' or '$'), column after column like current_state
+    return ''.join(''.join(column) for column in current_state).encode('ascii')
+
+
+def decode_board(board, board_size):
+    cells = board.decode('ascii')
+    return [list(cells[x * board_size:(x + 1) * board_size]) for x in range(board_size)]
+
+
+def search_move(task):
+    # worker side: search the child of the root reached by one move.
+    # With alphabeta the window starts one point below (X) / above (O) the best value any worker has found so far,
+    # so the result is exact whenever the move can still be the best one
+    from Game import Game
+
+    (key, options, board, algo, max, h, move, index, startTime, deadline, max_depth) = task
+    game = worker_games.get(key)
+    if game is None:
+        game = Game(**options)
+        worker_games.clear()
+        worker_games[key] = game
+    game.current_state = decode_board(board, game.board_size)
+    if game.stats is not None:
+        game.stats.reset()
+    game.deadline = deadline
+    game.search_aborted = False
+    game.node_count = 0
+
+    alpha = np.inf
+    beta = -np.inf
+    if algo == Game.ALPHABETA:
+        if max:
+            alpha = worker_bound.value + 1
+        else:
+            beta = worker_bound.value - 1
+    v = game.search_root_move(algo, max, h, move[0], move[1], startTime=startTime, max_depth=max_depth, alpha=alpha, beta=beta)
+
+    exact = (v < alpha) if max else (v > beta)
+    if exact and not game.search_aborted:
+        with worker_bound.get_lock():
+            if (max and v < worker_bound.value) or (not max and v > worker_bound.value):
+                worker_bound.value = v
+    return (index, v, exact, game.stats.search if game.stats is not None else None, game.search_aborted)
+
+
+class RootParallel:
+    # shared bounds are int64, 10^n scores stop fitting past this size
+    MAX_BOARD_SIZE = 15
+
+    def __init__(self, game, workers=2):
+        self.game = game
+        self.workers = workers
+        self.bound = multiprocessing.Value('q', 0)
+        self.executor = None
+
+    def search(self, algo, max=False, h=0, startTime=0, max_depth=0):
+        # split the moves of the root over the worker processes, returns (value, x, y) like the serial search:
+        # the first move (in search order) with the best value. With move ordering on, the serial root order also
+        # depends on history the workers do not send back, so ties may go to another move of the same value
+        game = self.game
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker, initargs=(self.bound,))
+
+        # same starting value as the serial search, which is also where its window ends up after the first move
+        value = -2 * pow(10, game.win_size)
+        if max:
+            value = 2 * pow(10, game.win_size)
+        self.bound.value = value
+
+        moves = game.root_moves(algo, h)
+        board = encode_board(game.current_state)
+        key = (game.seed, tuple(sorted(game.options.items())))
+        tasks = [(key, game.worker_options(), board, algo, max, h, move, index, startTime, game.deadline, max_depth) for (index, move) in enumerate(moves)]
+
+        results = [None] * len(moves)
+        for (index, v, exact, counters, aborted) in self.executor.map(search_move, tasks):
+            results[index] = (v, exact)
+            if counters is not None and game.stats is not None:
+                game.stats.search.merge(counters)
+            if aborted:
+                game.search_aborted = True
+
+        x = None
+        y = None
+        for (index, (v, exact)) in enumerate(results):
+            if not exact:
+                continue
+            if (max and v < value) or (not max and v > value):
+                value = v
+                (x, y) = moves[index]
+        return (value, x, y)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def speedup_report(sizes=range(4, 9), worker_counts=(1, 2, 4, 8, 16), depth=4):
+    # time the same alphabeta root search with 1..16 workers on 4x4 to 8x8 boards
+    from Game import Game
+
+    for n in sizes:
+        serial = None
+        for workers in worker_counts:
+            g = Game(board_size=n, win_size=min(4, n), t=10 ** 6, max_depth_X=depth, max_depth_O=depth, bitboard=True, workers=workers)
+            g.current_state[n // 2][n // 2] = 'X'
+            g.empty_count -= 1
+            # first search starts the worker processes, only the second one is timed
+            g.alphabeta(max=True, h=2, startTime=time.time())
+            start = time.time()
+            (value, x, y) = g.alphabeta(max=True, h=2, startTime=time.time())
+            elapsed = time.time() - start
+            g.close()
+            if serial is None:
+                serial = elapsed
+            print(F'n={n} workers={workers}: {elapsed:.3f}s speedup {serial / elapsed:.2f}x move {g.COLUMN[x]}{y} value {value}')
+
+
+if __name__ == "__main__":
+    speedup_report()
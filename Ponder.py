@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class Ponderer:
+    # searches ahead on a background thread while play() waits for a human move: the position after the move the
+    # human is expected to play (the recommended one), searched for the next player, then the position after that
+    # answer, searched for the human again (the next recommendation). The search runs on a copy of the game that
+    # shares its transposition table, input() leaves the interpreter to the thread while the human types.
+    # Finished searches go to a small cache keyed by (board, side, algorithm, heuristic), which play() reads before
+    # searching itself
+    CACHE_SIZE = 256
+
+    def __init__(self, game):
+        self.game = game
+        self.copy = None
+        self.cache = OrderedDict()
+        self.thread = None
+        # (key, event set when it is over) of the search the thread is running
+        self.searching = None
+        self.stopped = False
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(state, max, algo, h):
+        return (''.join(''.join(column) for column in state), max, algo, h)
+
+    def start(self, state, move, plies):
+        # ponder the line that starts with move in state, plies being the (max, algo, h) of the searches that follow
+        self.stop()
+        if self.copy is None:
+            from Game import Game
+            options = self.game.worker_options()
+            options.update(ponder=False, quiet=True, stats=False)
+            self.copy = Game(recommend=False, **options)
+            # same zobrist keys (same seed), so the entries are good for both
+            self.copy.tt = self.game.tt
+        self.copy.deadline = None
+        self.copy.search_aborted = False
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, args=([column[:] for column in state], move, plies), daemon=True)
+        self.thread.start()
+
+    def run(self, state, move, plies):
+        copy = self.copy
+        # the human moves just before the first search
+        state[move[0]][move[1]] = 'X' if plies[0][0] else 'O'
+        for (max, algo, h) in plies:
+            copy.current_state = state
+            copy.empty_count = sum(column.count('.') for column in state)
+            if self.stopped or copy.is_end() is not None:
+                break
+            key = self.key(state, max, algo, h)
+            if key not in self.cache:
+                done = threading.Event()
+                self.searching = (key, done)
+                triplet = copy.search(algo, max=max, h=h, startTime=time.time())
+                if not copy.search_aborted and triplet is not None and triplet[1] is not None:
+                    self.store(key, triplet)
+                self.searching = None
+                done.set()
+                if self.stopped or triplet is None or triplet[1] is None:
+                    break
+            else:
+                triplet = self.cache[key]
+            state = [column[:] for column in state]
+            state[triplet[1]][triplet[2]] = 'O' if max else 'X'
+
+    def store(self, key, triplet):
+        self.cache[key] = triplet
+        if len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+
+    def result(self, state, max, algo, h):
+        # the pondered (value, x, y) of this search, waiting for the thread if it is running it right now, or None.
+        # On a miss the thread is stopped, the main search needs the CPU and the transposition table
+        key = self.key(state, max, algo, h)
+        searching = self.searching
+        if searching is not None and searching[0] == key:
+            searching[1].wait()
+        if key not in self.cache:
+            self.stop()
+            self.misses += 1
+            return None
+        # the thread goes on with the next search of the line, play() does not search in the meantime
+        # (with iterative deepening it stops the thread and searches anyway, from the pondered move)
+        self.hits += 1
+        self.cache.move_to_end(key)
+        return self.cache[key]
+
+    def stop(self):
+        # abort the search of the thread (every node returns at once) and wait for it
+        if self.thread is None:
+            return
+        self.stopped = True
+        self.copy.deadline = 0
+        self.copy.search_aborted = True
+        # nothing of the cut short search goes to the shared transposition table
+        self.copy.tt_timed_out = True
+        self.thread.join()
+        self.thread = None
+        self.copy.deadline = None
+        self.copy.search_aborted = False
@@ -0,0 +1,262 @@
+import math
+import time
+
+
+class Counters:
+    # per-depth search counters, one list slot per depth (or per move index for cutoff_moves)
+    def __init__(self, size):
+        self.nodes = [0] * size
+        self.leaves = [0] * size
+        self.terminals = [0] * size
+        self.cutoffs = [0] * size
+        # how many cutoffs the 1st, 2nd, ... move searched at a node caused
+        self.cutoff_moves = [0] * size
+        self.heuristic_calls = 0
+        self.heuristic_time = 0.0
+
+    def clear(self):
+        # in place, the search keeps references to the lists
+        for counts in (self.nodes, self.leaves, self.terminals, self.cutoffs, self.cutoff_moves):
+            counts[:] = [0] * len(counts)
+        self.heuristic_calls = 0
+        self.heuristic_time = 0.0
+
+    def merge(self, other):
+        for (counts, others) in ((self.nodes, other.nodes), (self.leaves, other.leaves), (self.terminals, other.terminals),
+                                 (self.cutoffs, other.cutoffs), (self.cutoff_moves, other.cutoff_moves)):
+            for k in range(min(len(counts), len(others))):
+                counts[k] += others[k]
+        self.heuristic_calls += other.heuristic_calls
+        self.heuristic_time += other.heuristic_time
+        return self
+
+    def evaluation_count(self):
+        return sum(self.leaves)
+
+    def evaluation_count_by_depth(self):
+        # the {'depth': count} dict of the gameTrace and scoreboard, depths without evaluations left out
+        return {str(depth): count for (depth, count) in enumerate(self.leaves) if count}
+
+    def average_evaluation_depth(self):
+        # mean of the depths that have evaluations, the "Average evaluation depth" of the gameTrace and scoreboard
+        depths = [depth for (depth, count) in enumerate(self.leaves) if count]
+        return sum(depths) / len(depths) if depths else 0
+
+    def node_count(self):
+        return sum(self.nodes)
+
+    def branching_factor(self):
+        # children searched per interior node
+        interior = sum(self.nodes) - sum(self.leaves)
+        return (sum(self.nodes) - self.nodes[0]) / interior if interior > 0 else 0
+
+    def cutoff_rate(self):
+        # share of the interior nodes that ended on a cutoff, and share of the cutoffs the first move caused
+        interior = sum(self.nodes) - sum(self.leaves)
+        cutoffs = sum(self.cutoffs)
+        return (cutoffs / interior if interior > 0 else 0, self.cutoff_moves[0] / cutoffs if cutoffs > 0 else 0)
+
+
+class SearchStats:
+    def __init__(self, board_size, timing=False, callback=None):
+        # counters of the running search, the current round (one move of the game) and the rest of the game.
+        # The search writes straight into the lists of self.search through the aliases below
+        size = board_size * board_size + 2
+        self.search = Counters(size)
+        self.round = Counters(size)
+        self.game = Counters(size)
+        self.nodes = self.search.nodes
+        self.leaves = self.search.leaves
+        self.terminals = self.search.terminals
+        self.cutoffs = self.search.cutoffs
+        self.cutoff_moves = self.search.cutoff_moves
+        # also time the heuristic calls, which costs two clock reads per evaluation
+        self.timing = timing
+        # called as callback(counters, info) at the end of every search run through Game.search()
+        self.callback = callback
+
+    def attach(self, game):
+        # with timing on, the heuristics of the game (and of its bitboard/batch evaluators) are replaced
+        # by timed versions, so nothing in the search itself changes
+        if not self.timing:
+            return
+        self.timed(game, 'heuristic1_eval')
+        self.timed(game, 'heuristic2_eval')
+        if game.bitboard is not None:
+            self.timed(game.bitboard, 'heuristic1_eval')
+            self.timed(game.bitboard, 'heuristic2_eval')
+        if game.batch is not None:
+            self.timed(game.batch, 'evaluate')
+
+    def timed(self, target, name):
+        function = getattr(target, name)
+        search = self.search
+
+        def timed_function(*args, **kwargs):
+            start = time.perf_counter()
+            value = function(*args, **kwargs)
+            search.heuristic_time += time.perf_counter() - start
+            search.heuristic_calls += 1
+            return value
+        setattr(target, name, timed_function)
+
+    def end_search(self, info):
+        # info: dict with the algorithm, side, heuristic, depth and result of the search
+        if self.callback is not None:
+            self.callback(self.search, info)
+        self.round.merge(self.search)
+        self.search.clear()
+
+    def end_round(self):
+        # counters of the round that just ended, the game totals keep them
+        self.round.merge(self.search)
+        self.search.clear()
+        ended = self.round
+        self.game.merge(ended)
+        self.round = Counters(len(ended.nodes))
+        return ended
+
+    def totals(self):
+        # counters of the whole game so far
+        return Counters(len(self.game.nodes)).merge(self.game).merge(self.round).merge(self.search)
+
+    def reset(self):
+        self.search.clear()
+        self.round.clear()
+        self.game.clear()
+
+
+class RunningStats:
+    # count, mean and variance of a stream of values in constant memory (Welford), merging two of them gives the
+    # stats of both streams
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def variance(self):
+        return self.m2 / self.count if self.count > 0 else 0.0
+
+    def std(self):
+        return math.sqrt(self.variance())
+
+
+class LatencyHistogram:
+    # HDR-style histogram of durations in microseconds: one bucket per microsecond below 2^SUB_BITS, then
+    # 2^(SUB_BITS - 1) buckets per power of two, so a percentile is within 1/64 of the true value whatever the
+    # range. Buckets are counted in a list that grows with the longest duration seen (a few thousand at most),
+    # histograms merge exactly by adding the counts
+    SUB_BITS = 7
+    UNIT = 1e-6
+
+    def __init__(self):
+        self.counts = []
+        self.count = 0
+        self.max = 0.0
+
+    def bucket(self, ticks):
+        if ticks < (1 << self.SUB_BITS):
+            return ticks
+        shift = ticks.bit_length() - self.SUB_BITS
+        half = 1 << (self.SUB_BITS - 1)
+        return (1 << self.SUB_BITS) + (shift - 1) * half + (ticks >> shift) - half
+
+    def highest(self, bucket):
+        # largest duration in microseconds that falls in bucket
+        if bucket < (1 << self.SUB_BITS):
+            return bucket
+        half = 1 << (self.SUB_BITS - 1)
+        shift = (bucket - (1 << self.SUB_BITS)) // half + 1
+        return ((half + (bucket - (1 << self.SUB_BITS)) % half + 1) << shift) - 1
+
+    def add(self, seconds):
+        bucket = self.bucket(max(0, int(seconds / self.UNIT)))
+        if bucket >= len(self.counts):
+            self.counts.extend([0] * (bucket + 1 - len(self.counts)))
+        self.counts[bucket] += 1
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for (bucket, count) in enumerate(other.counts):
+            self.counts[bucket] += count
+        self.count += other.count
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, p):
+        # duration in seconds that p percent of the values do not exceed
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(p / 100 * self.count))
+        seen = 0
+        for (bucket, count) in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.max, (self.highest(bucket) + 1) * self.UNIT)
+        return self.max
+
+
+class TimeStats:
+    # running mean/variance and latency histogram of the move times of a round, a game or a series. count and mean
+    # are attributes, as on RunningStats
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self):
+        self.running = RunningStats()
+        self.histogram = LatencyHistogram()
+
+    @property
+    def count(self):
+        return self.running.count
+
+    def add(self, seconds):
+        self.running.add(seconds)
+        self.histogram.add(seconds)
+
+    def merge(self, other):
+        self.running.merge(other.running)
+        self.histogram.merge(other.histogram)
+        return self
+
+    @property
+    def mean(self):
+        return self.running.mean
+
+    def percentile(self, p):
+        return self.histogram.percentile(p)
+
+    def summary(self):
+        # {'mean', 'std', 'p50', 'p95', 'p99', 'max'} in seconds
+        summary = {'mean': self.running.mean, 'std': self.running.std()}
+        for p in self.PERCENTILES:
+            summary['p' + str(p)] = self.histogram.percentile(p)
+        summary['max'] = self.histogram.max
+        return summary
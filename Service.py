@@ -0,0 +1,296 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from Game import Game
+from ParallelSearch import decode_board
+
+# one JSON object per line each way. A request:
+#   {"id": 1, "n": 5, "s": 4, "blocs": ["1 1"], "cells": "....X....O...", "side": "X", "depth": 3, "algo": 1, "h": 2, "t": 5,
+#    "options": {"move_ordering": true}}
+# cells holds the n*n cells column after column like current_state ('.', 'X', 'O', '$'), blocs may be left out when
+# the cells mark them with '$'. The answer echoes the id:
+#   {"id": 1, "move": "C2", "x": 2, "y": 2, "value": 120, "cached": false, "stats": {"nodes": ..., "evaluations": ...,
+#    "by_depth": {...}, "time": ...}}
+# or {"id": 1, "error": "..."}. {"type": "stats"} returns the service counters instead
+ALGORITHMS = (Game.MINIMAX, Game.ALPHABETA, Game.MCTS)
+# blocs are "x y" strings read back as bloc[0] and bloc[2] (Game, Bitboard, ...), so coordinates have a single digit
+MAX_BOARD_SIZE = 10
+# engine options a request may set: search settings only, nothing that opens files or starts threads in the worker
+SEARCH_OPTIONS = ('incremental_end', 'bitboard', 'tt_size', 'iterative', 'move_ordering', 'incremental_eval', 'batch_eval',
+                  'symmetry', 'threats', 'pvs', 'live_cells', 'radius', 'stack_search', 'seed')
+
+# set in every worker process, one Game per configuration (size, blocs, options) so transposition tables stay warm
+worker_games = {}
+
+
+def parse_request(request):
+    # validated request, or a ValueError naming the bad field
+    n = int(request['n'])
+    s = int(request.get('s', n))
+    cells = str(request['cells'])
+    if not 3 <= n <= MAX_BOARD_SIZE or len(cells) != n * n or set(cells) - set('.XO$'):
+        raise ValueError(F'n must be 3 to {MAX_BOARD_SIZE} and cells hold n*n of . X O $')
+    blocs = request.get('blocs')
+    if blocs is None:
+        blocs = [F'{k // n} {k % n}' for (k, cell) in enumerate(cells) if cell == '$']
+    for bloc in blocs:
+        if not (isinstance(bloc, str) and len(bloc) == 3 and bloc[1] == ' ' and bloc[0].isdigit() and bloc[2].isdigit()
+                and int(bloc[0]) < n and int(bloc[2]) < n and cells[int(bloc[0]) * n + int(bloc[2])] in '.$'):
+            raise ValueError('blocs must be "x y" empty cells of the board')
+    options = dict(request.get('options', {}))
+    if set(options) - set(SEARCH_OPTIONS):
+        raise ValueError('options can only be ' + ', '.join(SEARCH_OPTIONS))
+    side = request.get('side', 'X')
+    algo = int(request.get('algo', Game.ALPHABETA))
+    h = int(request.get('h', 2))
+    if side not in ('X', 'O') or algo not in ALGORITHMS or h not in (0, 1, 2):
+        raise ValueError('side must be X or O, algo 0, 1 or 4 and h 0, 1 or 2')
+    return {'n': n, 's': s, 'blocs': sorted(blocs), 'cells': cells, 'side': side, 'depth': int(request.get('depth', 3)), 'algo': algo, 'h': h,
+            't': float(request.get('t', 5)), 'options': options}
+
+
+def request_key(request):
+    # solved positions are shared between clients asking for the same search of the same position
+    return json.dumps([request[field] for field in ('n', 's', 'blocs', 'cells', 'side', 'depth', 'algo', 'h', 't')] + [sorted(request['options'].items())])
+
+
+def analyze(request):
+    # worker side: one search, the answer without id and cache flag
+    n = request['n']
+    options = dict(request['options'], recommend=False, quiet=True, workers=1)
+    key = json.dumps([n, request['s'], request['blocs'], request['t'], sorted(options.items())])
+    game = worker_games.get(key)
+    if game is None:
+        game = Game(board_size=n, bloc_num=len(request['blocs']), blocs_positions=request['blocs'], win_size=request['s'], t=request['t'], **options)
+        worker_games[key] = game
+    game.current_state = decode_board(request['cells'].encode('ascii'), n)
+    for bloc in request['blocs']:
+        game.current_state[int(bloc[0])][int(bloc[2])] = '$'
+    game.empty_count = sum(column.count('.') for column in game.current_state)
+    if game.is_end() is not None:
+        return {'error': 'the game is over'}
+    game.player_turn = request['side']
+    game.max_depth_X = request['depth']
+    game.max_depth_O = request['depth']
+    if game.stats is not None:
+        game.stats.reset()
+    start = time.time()
+    (value, x, y) = game.search(request['algo'], max=request['side'] == 'O', h=request['h'], startTime=start)
+    answer = {'move': Game.COLUMN[x] + str(y), 'x': x, 'y': y, 'value': value, 'stats': {'time': time.time() - start}}
+    if game.stats is not None:
+        counters = game.stats.totals()
+        answer['stats'].update(nodes=counters.node_count(), evaluations=counters.evaluation_count(), by_depth=counters.evaluation_count_by_depth())
+    return answer
+
+
+def analyze_batch(requests):
+    answers = []
+    for request in requests:
+        try:
+            answers.append(analyze(request))
+        except Exception as error:
+            answers.append({'error': repr(error)})
+    return answers
+
+
+class AnalysisService:
+    # requests of every connection go through one queue. The batcher takes what arrived within batch_wait seconds
+    # (at most batch_size), drops positions already cached or being searched, and splits the rest over the worker
+    # processes. Answers of finished searches go to an LRU cache of cache_size positions shared by all clients
+    def __init__(self, workers=os.cpu_count(), cache_size=100000, batch_size=32, batch_wait=0.005):
+        self.workers = workers
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.cache = OrderedDict()
+        # searches queued or running: key -> future of the answer
+        self.pending = {}
+        self.queue = None
+        self.executor = None
+        self.counters = {'requests': 0, 'hits': 0, 'shared': 0, 'searches': 0, 'batches': 0, 'errors': 0}
+
+    async def start(self, path=None, host='127.0.0.1', port=0):
+        # listen on the Unix socket path, or on host:port (port 0 picks a free one), returns the asyncio server
+        self.queue = asyncio.Queue()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.batcher = asyncio.ensure_future(self.run_batches())
+        if path is not None:
+            return await asyncio.start_unix_server(self.serve, path=path)
+        return await asyncio.start_server(self.serve, host=host, port=port)
+
+    def close(self):
+        self.batcher.cancel()
+        self.executor.shutdown(wait=False)
+
+    async def serve(self, reader, writer):
+        # the requests of a connection are answered as they finish, not in order
+        lock = asyncio.Lock()
+        tasks = set()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            task = asyncio.ensure_future(self.answer(line, writer, lock))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+        writer.close()
+
+    async def answer(self, line, writer, lock):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('a request must be a JSON object')
+            request_id = request.get('id')
+            if request.get('type') == 'stats':
+                answer = self.stats()
+            else:
+                answer = await self.analyze(parse_request(request))
+        except (ValueError, KeyError, TypeError) as error:
+            self.counters['errors'] += 1
+            answer = {'error': str(error)}
+        answer = dict(answer, id=request_id)
+        async with lock:
+            writer.write((json.dumps(answer) + "\n").encode())
+            await writer.drain()
+
+    async def analyze(self, request):
+        self.counters['requests'] += 1
+        key = request_key(request)
+        answer = self.cache.get(key)
+        if answer is not None:
+            self.cache.move_to_end(key)
+            self.counters['hits'] += 1
+            return dict(answer, cached=True)
+        future = self.pending.get(key)
+        if future is not None:
+            # the same position is already queued or being searched for another request
+            self.counters['shared'] += 1
+            return dict(await asyncio.shield(future), cached=True)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key] = future
+        await self.queue.put((key, request))
+        return dict(await asyncio.shield(future), cached=False)
+
+    async def run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.counters['batches'] += 1
+            # one chunk of the batch per worker, each chunk is sent in one round trip
+            chunks = [batch[k::self.workers] for k in range(min(self.workers, len(batch)))]
+            for chunk in chunks:
+                asyncio.ensure_future(self.run_chunk(chunk))
+
+    async def run_chunk(self, chunk):
+        loop = asyncio.get_running_loop()
+        try:
+            answers = await loop.run_in_executor(self.executor, analyze_batch, [request for (key, request) in chunk])
+        except Exception as error:
+            answers = [{'error': repr(error)}] * len(chunk)
+        for ((key, request), answer) in zip(chunk, answers):
+            self.counters['searches'] += 1
+            if 'error' not in answer:
+                self.cache[key] = answer
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+            else:
+                self.counters['errors'] += 1
+            self.pending.pop(key).set_result(answer)
+
+    def stats(self):
+        return dict(self.counters, cached=len(self.cache), pending=len(self.pending))
+
+
+class AnalysisClient:
+    # blocking client of the service, address is a Unix socket path or a (host, port) pair
+    def __init__(self, address):
+        if isinstance(address, str):
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.connect(address)
+        self.file = self.socket.makefile('rw')
+        self.next_id = 0
+
+    def send(self, request):
+        self.next_id += 1
+        request = dict(request, id=self.next_id)
+        self.file.write(json.dumps(request) + "\n")
+        self.file.flush()
+        return self.next_id
+
+    def receive(self):
+        return json.loads(self.file.readline())
+
+    def analyze(self, game=None, **request):
+        # best move of a position: either the fields of a request, or a Game whose current position is sent
+        # (side, depth, algo, h, t and options can still be given)
+        if game is not None:
+            request = dict({'n': game.board_size, 's': game.win_size, 'blocs': game.blocs_positions,
+                            'cells': ''.join(''.join(column) for column in game.current_state), 'side': game.player_turn}, **request)
+        self.send(request)
+        return self.receive()
+
+    def analyze_many(self, requests):
+        # send every request before reading the answers, so they can be batched, answers in request order
+        ids = [self.send(request) for request in requests]
+        answers = {}
+        while len(answers) < len(ids):
+            answer = self.receive()
+            answers[answer['id']] = answer
+        return [answers[request_id] for request_id in ids]
+
+    def stats(self):
+        self.send({'type': 'stats'})
+        return self.receive()
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve best move requests to local clients.')
+    parser.add_argument('--socket', help='Unix socket path to listen on (instead of a TCP port)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='worker processes running the searches')
+    parser.add_argument('--cache', type=int, default=100000, help='solved positions kept in the cache')
+    parser.add_argument('--batch', type=int, default=32, help='requests sent to the workers at most at once')
+    args = parser.parse_args()
+
+    async def serve():
+        service = AnalysisService(workers=args.workers, cache_size=args.cache, batch_size=args.batch)
+        server = await service.start(path=args.socket, host=args.host, port=args.port)
+        print('listening on ' + (args.socket if args.socket else F'{args.host}:{server.sockets[0].getsockname()[1]}'))
+        try:
+            await server.serve_forever()
+        finally:
+            service.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
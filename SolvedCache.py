@@ -0,0 +1,139 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+
+
+class SolvedCache:
+    # results of whole searches from the root, kept in an SQLite file shared by games, series, tournament workers
+    # and later runs. A key is a hash of everything that decides the result: n, s, bloc layout, board, side to move,
+    # depth, algorithm, heuristic and the engine options. Only searches the time limit did not cut short are stored.
+    # The file is in WAL mode so worker processes read while one writes, each process opens its own connection on
+    # first use. Past max_entries the least recently used tenth of the entries is evicted. A hit only takes the write
+    # lock once every TOUCH_INTERVAL hits, when the use times of the entries hit since are written in one transaction
+    # (and before evicting or closing), so the LRU order is slightly behind between two writes.
+    # Hits, misses and stores are counted per instance, close() adds the ones not added yet to the totals in the file
+    EVICT_INTERVAL = 64
+    TOUCH_INTERVAL = 64
+    TIMEOUT = 30
+
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.connection = None
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.flushed = (0, 0, 0)
+        # key: time of the last hit, not written to the file yet
+        self.touched = {}
+
+    def connect(self):
+        if self.connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # the ponder thread searches on a copy of the game, so the connection may be used from another thread
+            self.connection = sqlite3.connect(self.path, timeout=self.TIMEOUT, isolation_level=None, check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS positions (key BLOB PRIMARY KEY, value INTEGER, x INTEGER, y INTEGER, used REAL)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS positions_used ON positions (used)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, count INTEGER)')
+        return self.connection
+
+    @staticmethod
+    def key(*fields):
+        return hashlib.blake2b(repr(fields).encode(), digest_size=16).digest()
+
+    def lookup(self, key):
+        # (value, x, y) stored for key, or None
+        connection = self.connect()
+        row = connection.execute('SELECT value, x, y FROM positions WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.touched[key] = time.time()
+        if len(self.touched) >= self.TOUCH_INTERVAL:
+            self.touch()
+        return row
+
+    def touch(self):
+        # write the use times of the entries hit since the last write
+        if not self.touched:
+            return
+        connection = self.connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany('UPDATE positions SET used = ? WHERE key = ?', [(used, key) for (key, used) in self.touched.items()])
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        self.touched.clear()
+
+    def store(self, key, triplet):
+        connection = self.connect()
+        self.touched.pop(key, None)
+        connection.execute('INSERT OR REPLACE INTO positions VALUES (?, ?, ?, ?, ?)', (key, triplet[0], triplet[1], triplet[2], time.time()))
+        self.stores += 1
+        if self.stores % self.EVICT_INTERVAL == 0:
+            self.evict()
+
+    def evict(self):
+        self.touch()
+        connection = self.connect()
+        count = connection.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+        if count > self.max_entries:
+            excess = count - self.max_entries + self.max_entries // 10
+            connection.execute('DELETE FROM positions WHERE key IN (SELECT key FROM positions ORDER BY used LIMIT ?)', (excess,))
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0
+
+    def totals(self):
+        # {'hits', 'misses', 'stores', 'entries'} of every run that used the file
+        connection = self.connect()
+        totals = dict(connection.execute('SELECT name, count FROM counters').fetchall())
+        totals = {name: totals.get(name, 0) for name in ('hits', 'misses', 'stores')}
+        totals['entries'] = connection.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+        return totals
+
+    def close(self):
+        if self.connection is None:
+            return
+        counts = (self.hits, self.misses, self.stores)
+        for (name, count, flushed) in zip(('hits', 'misses', 'stores'), counts, self.flushed):
+            if count > flushed:
+                self.connection.execute('INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET count = count + ?',
+                                        (name, count - flushed, count - flushed))
+        self.flushed = counts
+        self.evict()
+        self.connection.close()
+        self.connection = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show (or clear) a solved position cache file.')
+    parser.add_argument('path', help='cache file')
+    parser.add_argument('--clear', action='store_true', help='remove every entry and reset the counters')
+    args = parser.parse_args()
+    if not os.path.exists(args.path):
+        parser.error(args.path + ' does not exist')
+    cache = SolvedCache(args.path)
+    if args.clear:
+        connection = cache.connect()
+        connection.execute('DELETE FROM positions')
+        connection.execute('DELETE FROM counters')
+    totals = cache.totals()
+    lookups = totals['hits'] + totals['misses']
+    print(F'{totals["entries"]} positions, {totals["hits"]} hits / {lookups} lookups'
+          + (F' ({100 * totals["hits"] / lookups:.1f}%)' if lookups else '') + F', {totals["stores"]} searches stored')
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+import time
+
+
+class StackSearch:
+    # minimax()/alphabeta() as one loop over an explicit stack instead of one Python call per node: the state of
+    # every ply (moves, next move, value, best move, bounds, move played) lives in lists made once per game, the
+    # board is a flat list of cells next to current_state, and the constants of a search are computed once.
+    # Values, moves and stats counters are the ones of the recursive functions. The legacy time limit (t - 0.15
+    # without deadline) is read every CLOCK_INTERVAL nodes instead of at every node.
+    # Transposition table, move ordering, symmetry, book and batch evaluation are only in the recursive functions,
+    # a game with one of them searches there
+    def __init__(self, game):
+        self.game = game
+        n = game.board_size
+        s = game.win_size
+        self.board_size = n
+        self.cell_x = [cell // n for cell in range(n * n)]
+        self.cell_y = [cell % n for cell in range(n * n)]
+        # the cells in the order of the loops of minimax()/alphabeta() (blocs are never empty, so they are skipped)
+        self.cells = list(range(n * n))
+        # per cell and direction, the s - 1 cells on each side, enough to find a line through it
+        self.rays = []
+        for x in range(n):
+            for y in range(n):
+                rays = []
+                for (dx, dy) in game.DIRECTIONS:
+                    forward = []
+                    backward = []
+                    for k in range(1, s):
+                        if 0 <= x + k * dx < n and 0 <= y + k * dy < n:
+                            forward.append((x + k * dx) * n + y + k * dy)
+                        if 0 <= x - k * dx < n and 0 <= y - k * dy < n:
+                            backward.append((x - k * dx) * n + y - k * dy)
+                    rays.append((forward, backward))
+                self.rays.append(rays)
+        size = n * n + 2
+        self.board = ['.'] * (n * n)
+        # per ply: list the moves are taken from and the index of the next one, moves tried, value, best cell,
+        # bounds (alpha bounds O, beta bounds X) and the cell played to reach the child being searched
+        self.moves = [None] * size
+        self.index = [0] * size
+        self.tried = [0] * size
+        self.value = [0] * size
+        self.best = [-1] * size
+        self.alpha = [0] * size
+        self.beta = [0] * size
+        self.played = [-1] * size
+
+    def supported(self):
+        game = self.game
+        return game.tt is None and game.ordering is None and game.symmetry is None and game.book is None and game.batch is None
+
+    def search(self, prune, max=False, h=0, startTime=0, max_depth=0, alpha=float('inf'), beta=float('-inf')):
+        # (value, x, y) of alphabeta() (prune) or minimax() from the root, after prepare_search()
+        game = self.game
+        state = game.current_state
+        board = self.board
+        cell_x = self.cell_x
+        cell_y = self.cell_y
+        cells = self.cells
+        for cell in cells:
+            board[cell] = state[cell_x[cell]][cell_y[cell]]
+        rays = self.rays
+        moves = self.moves
+        index = self.index
+        tried = self.tried
+        values = self.value
+        best = self.best
+        alphas = self.alpha
+        betas = self.beta
+        played = self.played
+
+        stats = game.stats
+        if stats is not None:
+            nodes = stats.nodes
+            leaves = stats.leaves
+            terminals = stats.terminals
+            cutoffs = stats.cutoffs
+            cutoff_moves = stats.cutoff_moves
+        win_size = game.win_size
+        win_value = pow(10, win_size)
+        floor = 2 * win_value
+        incremental_end = game.incremental_end
+        incremental_eval = game.incremental_eval
+        update_lines = game.update_lines
+        heuristic1_eval = game.heuristic1_eval
+        heuristic2_eval = game.heuristic2_eval
+        live = game.live
+        x_bits = 0
+        o_bits = 0
+        if live is not None:
+            for cell in cells:
+                if board[cell] == 'X':
+                    x_bits |= 1 << cell
+                elif board[cell] == 'O':
+                    o_bits |= 1 << cell
+        deadline = game.deadline
+        # without deadline the time limit only matters with a heuristic: past it every node is a leaf.
+        # alphabeta() does not look at the clock at the root
+        clock = deadline is None and h != 0
+        limit = startTime + game.t - 0.15
+        interval = game.CLOCK_INTERVAL
+        ticks = 0
+        timed_out = False
+        empty = game.empty_count
+        root_first = -1
+        if game.root_move is not None:
+            root_first = game.root_move[0] * self.board_size + game.root_move[1]
+
+        alphas[0] = alpha
+        betas[0] = beta
+        ply = 0
+        node_max = max
+        while True:
+            # a new node at ply, v is its value when it is a leaf
+            v = None
+            best[ply] = -1
+            if stats is not None:
+                nodes[ply] += 1
+            if deadline is not None and game.out_of_time():
+                v = floor if node_max else -floor
+            else:
+                result = None
+                if ply > 0 and incremental_end:
+                    cell = played[ply - 1]
+                    char = board[cell]
+                    for (forward, backward) in rays[cell]:
+                        count = 1
+                        for other in forward:
+                            if board[other] != char:
+                                break
+                            count += 1
+                        for other in backward:
+                            if board[other] != char:
+                                break
+                            count += 1
+                        if count >= win_size:
+                            result = char
+                            break
+                    if result is None and empty == 0:
+                        result = '.'
+                else:
+                    game.empty_count = empty
+                    result = game.is_end()
+                if result is not None:
+                    if stats is not None:
+                        leaves[ply] += 1
+                        terminals[ply] += 1
+                    v = win_value if result == 'X' else (-win_value if result == 'O' else 0)
+                else:
+                    if clock and not timed_out and (ply > 0 or not prune):
+                        if ticks % interval == 0 and time.time() >= limit:
+                            timed_out = True
+                        ticks += 1
+                    if ply == max_depth or timed_out:
+                        if ply != max_depth and h != 0:
+                            game.tt_timed_out = True
+                        if stats is not None and (h != 0 or deadline is not None):
+                            leaves[ply] += 1
+                        if h == 1:
+                            # alphabeta() evaluates (0, 0), minimax() the move of O that led here
+                            if prune or ply == 0 or node_max:
+                                v = heuristic1_eval(x=0, y=0)
+                            else:
+                                v = heuristic1_eval(x=cell_x[played[ply - 1]], y=cell_y[played[ply - 1]])
+                        elif h == 2:
+                            v = game.e2_total if incremental_eval else heuristic2_eval()
+                        elif deadline is not None:
+                            v = 0
+                    if v is None:
+                        values[ply] = floor if node_max else -floor
+                        moves[ply] = live.candidates(x_bits, o_bits, h)[2] if live is not None else cells
+                        if ply == 0 and root_first >= 0 and board[root_first] == '.' and root_first in moves[0]:
+                            # the best move of the previous iterative deepening depth goes first
+                            moves[0] = [root_first] + [cell for cell in moves[0] if cell != root_first]
+                        index[ply] = 0
+                        tried[ply] = 0
+
+            while True:
+                if v is not None:
+                    # the node at ply is over: hand v to its parent
+                    if ply == 0:
+                        game.empty_count = empty
+                        cell = best[0]
+                        if cell < 0:
+                            return (v, None, None)
+                        return (v, cell_x[cell], cell_y[cell])
+                    ply -= 1
+                    node_max = not node_max
+                    cell = played[ply]
+                    char = board[cell]
+                    board[cell] = '.'
+                    state[cell_x[cell]][cell_y[cell]] = '.'
+                    empty += 1
+                    if incremental_eval:
+                        update_lines(cell_x[cell], cell_y[cell], char, -1)
+                    if live is not None:
+                        if node_max:
+                            o_bits ^= 1 << cell
+                        else:
+                            x_bits ^= 1 << cell
+                    value = values[ply]
+                    if node_max:
+                        if v < value:
+                            values[ply] = value = v
+                            best[ply] = cell
+                    elif v > value:
+                        values[ply] = value = v
+                        best[ply] = cell
+                    if game.search_aborted:
+                        v = value
+                        continue
+                    if prune:
+                        if node_max:
+                            if value <= betas[ply]:
+                                if stats is not None:
+                                    cutoffs[ply] += 1
+                                    cutoff_moves[tried[ply] - 1] += 1
+                                v = value
+                                continue
+                            if value < alphas[ply]:
+                                alphas[ply] = value
+                        else:
+                            if value >= alphas[ply]:
+                                if stats is not None:
+                                    cutoffs[ply] += 1
+                                    cutoff_moves[tried[ply] - 1] += 1
+                                v = value
+                                continue
+                            if value > betas[ply]:
+                                betas[ply] = value
+                    v = None
+
+                # next move of the node at ply, or the node is over
+                source = moves[ply]
+                k = index[ply]
+                end = len(source)
+                while k < end and board[source[k]] != '.':
+                    k += 1
+                if k == end:
+                    v = values[ply]
+                    continue
+                index[ply] = k + 1
+                tried[ply] += 1
+                cell = source[k]
+                played[ply] = cell
+                char = 'O' if node_max else 'X'
+                board[cell] = char
+                state[cell_x[cell]][cell_y[cell]] = char
+                empty -= 1
+                if incremental_eval:
+                    update_lines(cell_x[cell], cell_y[cell], char, 1)
+                if live is not None:
+                    if node_max:
+                        o_bits ^= 1 << cell
+                    else:
+                        x_bits ^= 1 << cell
+                alphas[ply + 1] = alphas[ply]
+                betas[ply + 1] = betas[ply]
+                ply += 1
+                node_max = not node_max
+                break
@@ -0,0 +1,60 @@
+class Symmetry:
+    # the 8 rotations and reflections of an nxn board, as maps of the cell index x * n + y.
+    # Transform 0 is the identity
+    TRANSFORMS = [
+        lambda x, y, m: (x, y),
+        lambda x, y, m: (y, m - x),
+        lambda x, y, m: (m - x, m - y),
+        lambda x, y, m: (m - y, x),
+        lambda x, y, m: (x, m - y),
+        lambda x, y, m: (m - x, y),
+        lambda x, y, m: (y, x),
+        lambda x, y, m: (m - y, m - x),
+    ]
+
+    def __init__(self, board_size):
+        n = board_size
+        self.board_size = n
+        self.perms = []
+        for transform in self.TRANSFORMS:
+            perm = [0] * (n * n)
+            for x in range(n):
+                for y in range(n):
+                    (i, j) = transform(x, y, n - 1)
+                    perm[x * n + y] = i * n + j
+            self.perms.append(perm)
+        # inverse[k] is the transform that undoes transform k
+        self.inverse = [next(l for l in range(8) if all(self.perms[l][self.perms[k][c]] == c for c in range(n * n))) for k in range(8)]
+
+    def board_symmetries(self, current_state):
+        # transforms (besides the identity) that map current_state, blocs included, onto itself
+        n = self.board_size
+        cells = [current_state[x][y] for x in range(n) for y in range(n)]
+        return [k for k in range(1, 8) if all(cells[perm_c] == cell for (perm_c, cell) in zip(self.perms[k], cells))]
+
+    def stabilizer(self, symmetries, cell):
+        # symmetries of a position that are left after playing cell in it
+        return [k for k in symmetries if self.perms[k][cell] == cell]
+
+    def unique_cells(self, cells, symmetries):
+        # cells without the ones equivalent to an earlier cell under symmetries,
+        # so the first cell of every orbit (in search order) is the one kept
+        perms = [self.perms[k] for k in symmetries]
+        seen = set()
+        unique = []
+        for cell in cells:
+            if any(perm[cell] in seen for perm in perms):
+                continue
+            seen.add(cell)
+            unique.append(cell)
+        return unique
+
+    def unique_moves(self, moves, symmetries):
+        # same for a list of (x, y) moves
+        n = self.board_size
+        return [(cell // n, cell % n) for cell in self.unique_cells([x * n + y for (x, y) in moves], symmetries)]
+
+    def transform_move(self, k, move):
+        n = self.board_size
+        cell = self.perms[k][move[0] * n + move[1]]
+        return (cell // n, cell % n)
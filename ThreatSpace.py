@@ -0,0 +1,196 @@
+import time
+
+from Bitboard import Bitboard, popcount
+
+
+class ThreatSearch:
+    # threat-space search run before the main search: the side to move only plays moves that make a threat
+    # (a "four": s-1 pieces in a segment, or a "three": s-2 pieces that give a double four next move) and the
+    # other side only answers them, so forced wins far past the depth of alphabeta() are found in a few thousand nodes.
+    # A win it returns is proven, a failed search proves nothing, so a defense is only a move for the main search to try first
+    MIN_WIN_SIZE = 4
+    # attacker moves of the longest sequence looked for (twice that in plies)
+    MAX_DEPTH = 10
+    # share of the move time t it may take
+    TIME_SHARE = 0.25
+    CLOCK_INTERVAL = 256
+
+    def __init__(self, game):
+        self.game = game
+        self.board_size = game.board_size
+        self.win_size = game.win_size
+        board = game.bitboard if game.bitboard is not None else Bitboard(game)
+        # s-length segments that do not go through a bloc, the only ones a threat can be made in
+        self.win_masks = board.win_masks
+        self.cache = {}
+        self.deadline = None
+        self.aborted = False
+        self.nodes = 0
+        self.wins = 0
+        self.defenses = 0
+        # (x, y) of the only move found against a forced win of the other side by the last search, or None
+        self.defense = None
+
+    def search(self, max=False, startTime=0):
+        # (value, x, y) of a proven forced win of the side to move (O if max), or None when the main search has to decide.
+        # When the other side has a forced win and only one of the tried answers stops it, that move is left in
+        # self.defense: the threat search cannot prove it holds (nor rule out the moves it does not try)
+        game = self.game
+        self.defense = None
+        # a time limit that leaves no time (t of 0.15s or less) leaves none for the threats either
+        if game.t <= 0.15:
+            return None
+        n = self.board_size
+        x_bits = 0
+        o_bits = 0
+        for x in range(n):
+            for y in range(n):
+                if game.current_state[x][y] == 'X':
+                    x_bits |= 1 << (x * n + y)
+                elif game.current_state[x][y] == 'O':
+                    o_bits |= 1 << (x * n + y)
+        (mine, theirs) = (o_bits, x_bits) if max else (x_bits, o_bits)
+        self.deadline = startTime + (game.t - 0.15) * self.TIME_SHARE
+        self.aborted = False
+        self.cache = {}
+
+        # shortest forced win first
+        opponent_depth = None
+        for depth in range(1, self.MAX_DEPTH + 1):
+            cell = self.attack(mine, theirs, depth)
+            if self.aborted:
+                break
+            if cell is not None:
+                self.wins += 1
+                value = pow(10, self.win_size)
+                return (-value if max else value, cell // n, cell % n)
+            if opponent_depth is None and self.attack(theirs, mine, depth) is not None:
+                opponent_depth = depth
+            if self.aborted:
+                break
+            # the threats run out before the depth does
+            if not self.threat_cells(mine, theirs) and opponent_depth is None:
+                break
+
+        if opponent_depth is None or self.aborted:
+            return None
+        # the other side has a forced win if it could move now: keep the moves after which it has none
+        defenses = []
+        for cell in self.defense_cells(theirs, mine):
+            if self.attack(theirs, mine | (1 << cell), opponent_depth) is None:
+                defenses.append(cell)
+            if self.aborted or len(defenses) > 1:
+                return None
+        if len(defenses) == 1:
+            self.defenses += 1
+            self.defense = (defenses[0] // n, defenses[0] % n)
+        return None
+
+    def out_of_time(self):
+        self.nodes += 1
+        if self.nodes % self.CLOCK_INTERVAL == 0 and time.time() >= self.deadline:
+            self.aborted = True
+        return self.aborted
+
+    def win_cells(self, mine, theirs):
+        # empty cells that complete a segment of mine
+        s1 = self.win_size - 1
+        cells = 0
+        for mask in self.win_masks:
+            if not mask & theirs and popcount(mask & mine) == s1:
+                cells |= mask & ~mine
+        return cells
+
+    def doubles(self, mine, theirs):
+        # cells where a move of mine makes two fours at once, and the empty cells of the segments involved
+        # (every move that can stop the double four)
+        s2 = self.win_size - 2
+        partners = {}
+        segments = {}
+        for mask in self.win_masks:
+            if not mask & theirs and popcount(mask & mine) == s2:
+                empty = mask & ~mine
+                a = empty & -empty
+                b = empty ^ a
+                partners[a] = partners.get(a, 0) | b
+                partners[b] = partners.get(b, 0) | a
+                segments[a] = segments.get(a, 0) | empty
+                segments[b] = segments.get(b, 0) | empty
+        cells = 0
+        zone = 0
+        for (bit, others) in partners.items():
+            if popcount(others) >= 2:
+                cells |= bit
+                zone |= segments[bit]
+        return (cells, zone)
+
+    def threat_cells(self, mine, theirs, least=None):
+        # empty cells of the segments holding at least least pieces of mine and none of theirs
+        least = self.win_size - 3 if least is None else least
+        cells = 0
+        for mask in self.win_masks:
+            if not mask & theirs and popcount(mask & mine) >= least:
+                cells |= mask & ~mine
+        return cells & ~theirs
+
+    def defense_cells(self, attacker, defender):
+        # cells worth trying against a threat sequence of attacker: the cells of its segments, and the fours of defender
+        return _cells(self.threat_cells(attacker, defender) | self.threat_cells(defender, attacker, self.win_size - 2))
+
+    def attack(self, mine, theirs, depth):
+        # first cell (fours before threes, then board order) that starts a forced win of mine within depth moves, or None
+        wins = self.win_cells(mine, theirs)
+        if wins:
+            return _cells(wins)[0]
+        if depth == 0 or self.out_of_time():
+            return None
+        key = (mine, theirs, depth)
+        if key in self.cache:
+            return self.cache[key]
+        losses = self.win_cells(theirs, mine)
+        if losses & (losses - 1):
+            # two fours of theirs, only one can be blocked
+            candidates = []
+        elif losses:
+            # the block has to be a threat too
+            candidates = _cells(losses)
+        else:
+            fours = self.threat_cells(mine, theirs, self.win_size - 2)
+            candidates = _cells(fours) + _cells(self.threat_cells(mine, theirs) & ~fours)
+        found = None
+        for cell in candidates:
+            if self.defend(mine | (1 << cell), theirs, depth - 1):
+                found = cell
+                break
+            if self.aborted:
+                return None
+        self.cache[key] = found
+        return found
+
+    def defend(self, mine, theirs, depth):
+        # True when every answer to the threat just made still loses to a forced win of mine
+        if self.win_cells(theirs, mine):
+            return False
+        wins = self.win_cells(mine, theirs)
+        if wins & (wins - 1):
+            return True
+        if wins:
+            return self.attack(mine, theirs | wins, depth) is not None
+        (doubles, zone) = self.doubles(mine, theirs)
+        if not doubles:
+            return False
+        # a move outside the segments of the double fours that is not a four either leaves one of them to play
+        for cell in _cells(zone | self.threat_cells(theirs, mine, self.win_size - 2)):
+            if self.attack(mine, theirs | (1 << cell), depth) is None:
+                return False
+        return True
+
+
+def _cells(bits):
+    # cell indexes of the set bits, lowest first
+    cells = []
+    while bits:
+        bit = bits & -bits
+        bits ^= bit
+        cells.append(bit.bit_length() - 1)
+    return cells
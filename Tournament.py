@@ -0,0 +1,163 @@
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from Game import Game
+from Trace import open_trace
+
+# grid parameters and their defaults when neither the config file nor the command line sets them
+GRID = {'n': [3], 'b': [0], 's': [3], 't': [5], 'd1': [2], 'd2': [2], 'a1': [Game.ALPHABETA], 'a2': [Game.ALPHABETA], 'h1': [1], 'h2': [2]}
+FIELDS = ['id', 'n', 'b', 'blocs', 's', 't', 'd1', 'd2', 'a1', 'a2', 'h1', 'h2', 'repeat', 'winner', 'turn_count',
+          'evaluation_count', 'average_evaluation_time', 'evaluation_count_by_depth', 'run_time']
+
+
+def load_config(path=None, overrides={}):
+    # config file: a JSON object with a list of values per grid parameter, e.g.
+    #   {"n": [4, 5], "s": [3, 4], "d1": [2, 3], "h1": [1, 2], "blocs": [[], ["1 1", "2 2"]], "repeat": 2,
+    #    "options": {"bitboard": true, "move_ordering": true}}
+    # "blocs" lists explicit bloc layouts (b is then the size of the layout), without it b blocs are placed at random
+    config = {}
+    if path is not None:
+        with open(path) as config_file:
+            config = json.load(config_file)
+    for (key, value) in overrides.items():
+        if value is not None:
+            config[key] = value
+    return config
+
+
+def random_blocs(n, b, rng):
+    cells = [(x, y) for x in range(n) for y in range(n)]
+    return [f'{x} {y}' for (x, y) in rng.sample(cells, b)]
+
+
+def expand_grid(config):
+    # every combination of the grid, repeated config['repeat'] times, as one entry per game.
+    # The id of an entry only depends on its parameters so an interrupted run can skip what it already played
+    grid = {key: config.get(key, default) for (key, default) in GRID.items()}
+    repeat = config.get('repeat', 1)
+    seed = config.get('seed', 0)
+    entries = []
+    for (n, s, t, d1, d2, a1, a2, h1, h2) in itertools.product(grid['n'], grid['s'], grid['t'], grid['d1'], grid['d2'], grid['a1'], grid['a2'], grid['h1'], grid['h2']):
+        if s > n:
+            continue
+        if 'blocs' in config:
+            layouts = [layout for layout in config['blocs'] if all(int(bloc[0]) < n and int(bloc[2]) < n for bloc in layout)]
+        else:
+            # seeded per (n, b) so the same game gets the same layout whatever else the grid holds
+            layouts = [random_blocs(n, b, random.Random(F'{seed}-{n}-{b}')) for b in grid['b'] if b <= n * n]
+        for blocs in layouts:
+            for k in range(repeat):
+                entry = {'n': n, 'b': len(blocs), 'blocs': blocs, 's': s, 't': t, 'd1': d1, 'd2': d2, 'a1': a1, 'a2': a2, 'h1': h1, 'h2': h2, 'repeat': k}
+                entry['id'] = '-'.join(str(entry[key]) for key in ['n', 's', 't', 'd1', 'd2', 'a1', 'a2', 'h1', 'h2', 'repeat']) + '-' + '.'.join(bloc.replace(' ', '_') for bloc in blocs)
+                entries.append(entry)
+    return entries
+
+
+def play_entry(entry, options={}, trace=False):
+    # play one quiet AI vs AI game of the grid (in a worker process)
+    start = time.time()
+    g = Game(recommend=False, board_size=entry['n'], bloc_num=entry['b'], blocs_positions=entry['blocs'], win_size=entry['s'], t=entry['t'],
+             max_depth_X=entry['d1'], max_depth_O=entry['d2'], series=True, **dict(options, quiet=True))
+    trace_file = io.StringIO()
+    g.play(algo1=entry['a1'], algo2=entry['a2'], player_x=Game.AI, player_o=Game.AI, heuristic_x=entry['h1'], heuristic_o=entry['h2'], trace_file=trace_file)
+    record = dict(entry)
+    record.update(winner=g.winner, turn_count=g.turn_count, evaluation_count=g.evaluation_count,
+                  average_evaluation_time=g.evaluation_times.mean,
+                  evaluation_count_by_depth=g.evaluation_count_by_depth, run_time=round(time.time() - start, 6))
+    return (record, g.trace_file_name(), trace_file.getvalue() if trace else None)
+
+
+def completed_ids(output):
+    # ids of the games already in the output file
+    if not os.path.exists(output):
+        return set()
+    with open(output, newline='') as output_file:
+        if output.endswith('.csv'):
+            return set(row['id'] for row in csv.DictReader(output_file))
+        ids = set()
+        for line in output_file:
+            # a line cut short by an interruption is simply played again (run() drops it before appending)
+            try:
+                ids.add(json.loads(line)['id'])
+            except (ValueError, KeyError):
+                pass
+        return ids
+
+
+def drop_partial_line(output):
+    # cut off the end of a record an interruption left without its newline, so the next record starts on a line of its own
+    if not os.path.exists(output):
+        return
+    with open(output, 'rb+') as output_file:
+        end = output_file.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - 4096)
+            output_file.seek(start)
+            block = output_file.read(position - start)
+            newline = block.rfind(b'\n')
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position < end:
+            output_file.truncate(position)
+
+
+def run(config, output='results.jsonl', workers=1, trace=False):
+    # play every game of the grid that is not in output yet and append one record per game as soon as it is over
+    entries = expand_grid(config)
+    drop_partial_line(output)
+    done = completed_ids(output)
+    todo = [entry for entry in entries if entry['id'] not in done]
+    print(F'{len(entries)} games in the grid, {len(entries) - len(todo)} already played, {len(todo)} to play')
+
+    is_csv = output.endswith('.csv')
+    new_csv = is_csv and (not os.path.exists(output) or os.path.getsize(output) == 0)
+    with open(output, 'a', newline='') as output_file:
+        writer = None
+        if is_csv:
+            writer = csv.DictWriter(output_file, fieldnames=FIELDS)
+            if new_csv:
+                writer.writeheader()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(play_entry, entry, config.get('options', {}), trace) for entry in todo]
+            for (count, future) in enumerate(as_completed(futures)):
+                (record, trace_file_name, trace_text) = future.result()
+                if is_csv:
+                    row = dict(record)
+                    row['blocs'] = json.dumps(row['blocs'])
+                    row['evaluation_count_by_depth'] = json.dumps(row['evaluation_count_by_depth'])
+                    writer.writerow(row)
+                else:
+                    output_file.write(json.dumps(record) + '\n')
+                output_file.flush()
+                if trace_text is not None:
+                    with open_trace(trace_file_name) as trace_file:
+                        trace_file.write(trace_text)
+                print(F'[{count + 1}/{len(todo)}] {record["id"]}: winner {record["winner"]} in {record["turn_count"]} moves')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play a grid of AI vs AI games without any prompt.')
+    parser.add_argument('config', nargs='?', help='JSON config file with the grid (see load_config())')
+    parser.add_argument('-o', '--output', default='results.jsonl', help='result file, .jsonl or .csv; games already in it are skipped')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--trace', action='store_true', help='also append every game to its gameTrace file')
+    for key in GRID:
+        parser.add_argument('--' + key, type=int, nargs='+', help='values of ' + key + ' (overrides the config file)')
+    args = parser.parse_args()
+
+    config = load_config(args.config, {key: getattr(args, key) for key in GRID})
+    run(config, output=args.output, workers=args.workers, trace=args.trace)
+
+
+if __name__ == "__main__":
+    main()
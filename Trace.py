@@ -0,0 +1,105 @@
+import gzip
+import json
+
+
+def open_trace(name, mode='a'):
+    # gameTrace files ending in .gz are gzip compressed. Appending adds a new gzip member, which gzip readers
+    # (zcat, gzip.open) read back as one file
+    if name.endswith('.gz'):
+        return gzip.open(name, mode + 't')
+    return open(name, mode)
+
+
+def format_percentiles(times):
+    # "p50 0.012 p95 0.034 p99 0.051 max 0.06" of a TimeStats
+    summary = times.summary()
+    return ' '.join(key + ' ' + str(round(summary[key], 7)) for key in ('p50', 'p95', 'p99', 'max'))
+
+
+class TextTrace:
+    # the human-readable gameTrace format, every block (header, board, move, stats) is built in memory
+    # and written with a single write()
+    def __init__(self, file):
+        self.file = file
+
+    def header(self, game, algo1, algo2, heuristic_x, heuristic_o):
+        self.file.write("\n==================================================================================\n\n"
+                        + "n=" + str(game.board_size) + " b=" + str(game.bloc_num) + " s=" + str(game.win_size) + " t=" + str(game.t) + "\n"
+                        + "blocs=" + str(game.blocs_positions) + "\n"
+                        + "Player 1: AI d=" + str(game.max_depth_X) + self.algorithm(game, algo1) + " e1(regular)\n"
+                        + "Player 2: AI d=" + str(game.max_depth_O) + self.algorithm(game, algo2) + " e2(defensive)\n")
+
+    def algorithm(self, game, algo):
+        if algo == game.MCTS:
+            return " a=MCTS"
+        return " a=False" if algo == game.MINIMAX else " a=True"
+
+    def board(self, game, board):
+        self.file.write(board)
+
+    def move(self, game, x, y, ai, execution_time):
+        if ai:
+            self.file.write("\nPlayer " + game.player_turn + " plays under AI control: " + game.COLUMN[x] + str(y) + "\n")
+        else:
+            self.file.write("\nPlayer " + game.player_turn + " plays: " + game.COLUMN[x] + str(y) + "\n")
+
+    def stats(self, times, counters, tt_count, total_moves=None):
+        # the i-vi statistics of a move, or of the whole game when total_moves is given, times is a TimeStats
+        lines = ("\ni\tAverage evaluation time(s): " + str(times.mean) + "\n"
+                 + "i\tEvaluation time percentiles(s): " + format_percentiles(times) + "\n")
+        if counters is not None:
+            by_depth = counters.evaluation_count_by_depth()
+            lines += ("ii\tHeuristic evaluations: " + str(counters.evaluation_count()) + "\n"
+                      + "iii\tEvaluations by depth: " + str(by_depth) + "\n"
+                      + "iv\tAverage evaluation depth: " + str(counters.average_evaluation_depth()) + "\n")
+        if tt_count is not None:
+            lines += "v\tTransposition table: " + str(tt_count[0]) + " hits, " + str(tt_count[1]) + " misses, " + str(tt_count[2]) + " collisions\n"
+        if total_moves is not None:
+            lines += "vi\tTotal moves: " + str(total_moves) + "\n"
+        self.file.write(lines)
+
+    def end(self, game, result):
+        if result == '.':
+            self.file.write("It's a tie!")
+        else:
+            self.file.write("The winner is " + result + "!")
+
+
+class JsonlTrace:
+    # compact move log: one JSON object per line for the game header, every move, the per-move stats and the end
+    # of the game. Boards are left out, they follow from the blocs and the moves
+    def __init__(self, file):
+        self.file = file
+
+    def record(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':')) + "\n")
+
+    def header(self, game, algo1, algo2, heuristic_x, heuristic_o):
+        self.record({'type': 'game', 'n': game.board_size, 'b': game.bloc_num, 's': game.win_size, 't': game.t, 'blocs': game.blocs_positions,
+                     'players': [{'d': game.max_depth_X, 'a': algo1, 'h': heuristic_x}, {'d': game.max_depth_O, 'a': algo2, 'h': heuristic_o}]})
+
+    def board(self, game, board):
+        pass
+
+    def move(self, game, x, y, ai, execution_time):
+        self.record({'type': 'move', 'turn': game.turn_count, 'player': game.player_turn, 'move': game.COLUMN[x] + str(y), 'x': x, 'y': y,
+                     'ai': ai, 'time': execution_time})
+
+    def stats(self, times, counters, tt_count, total_moves=None):
+        summary = times.summary()
+        record = {'type': 'stats', 'scope': 'move' if total_moves is None else 'game', 'average_time': summary['mean'],
+                  'p50_time': summary['p50'], 'p95_time': summary['p95'], 'p99_time': summary['p99'], 'max_time': summary['max']}
+        if counters is not None:
+            record.update(evaluations=counters.evaluation_count(), by_depth=counters.evaluation_count_by_depth(), nodes=counters.node_count(),
+                          cutoffs=sum(counters.cutoffs))
+        if tt_count is not None:
+            record['tt'] = list(tt_count)
+        if total_moves is not None:
+            record['moves'] = total_moves
+        self.record(record)
+
+    def end(self, game, result):
+        self.record({'type': 'end', 'winner': result})
+
+
+TRACE_FORMATS = {'text': TextTrace, 'jsonl': JsonlTrace}
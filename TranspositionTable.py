@@ -0,0 +1,54 @@
+class TranspositionTable:
+    # bound types of a stored value
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+    def __init__(self, size=1 << 16):
+        # size is the maximum number of entries. Entries live in buckets of two slots:
+        # slot 0 keeps the deepest search seen for the bucket, slot 1 always takes the newest one
+        self.bucket_count = max(1, size // 2)
+        self.slots = [None] * (2 * self.bucket_count)
+
+        # stats, reset by the caller after every move
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def probe(self, key):
+        # returns the (key, depth, value, bound, move) entry stored for key, or None
+        index = 2 * (key % self.bucket_count)
+        deep = self.slots[index]
+        if deep is not None and deep[0] == key:
+            self.hits += 1
+            return deep
+        recent = self.slots[index + 1]
+        if recent is not None and recent[0] == key:
+            self.hits += 1
+            return recent
+        # a miss where the bucket holds other positions is also counted as a collision
+        self.misses += 1
+        if deep is not None or recent is not None:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, value, bound, move):
+        index = 2 * (key % self.bucket_count)
+        entry = (key, depth, value, bound, move)
+        deep = self.slots[index]
+        if deep is None or deep[0] == key or depth >= deep[1]:
+            self.slots[index] = entry
+            # the old deep entry still beats whatever is in the always-replace slot
+            if deep is not None and deep[0] != key:
+                self.slots[index + 1] = deep
+        else:
+            self.slots[index + 1] = entry
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    def clear(self):
+        self.slots = [None] * (2 * self.bucket_count)
+        self.reset_stats()
@@ -0,0 +1,47 @@
+import json
+import os
+
+from Analyze import read_positions, run, write_binary
+
+CORPUS = os.path.join(os.path.dirname(__file__), 'data', 'positions.txt')
+
+
+def test_binary_round_trip(tmp_path):
+    # text -> .bin -> the same positions, ids as integers
+    positions = list(read_positions(CORPUS))
+    path = str(tmp_path / 'positions.bin')
+    assert write_binary(path, positions) == len(positions)
+    decoded = list(read_positions(path))
+    assert decoded == [dict(position, id=int(position['id']), n=int(position['n']), s=int(position['s'])) for position in positions]
+
+
+def test_boards_past_ten_are_refused(tmp_path):
+    # an 11x11 board would be set up with corrupted blocs, it is refused by the text and binary paths alike
+    text = tmp_path / 'positions.txt'
+    text.write_text('1 11 4 X ' + '$' + '.' * 120 + '\n2 4 3 X ' + '.' * 16 + '\n')
+    path = str(tmp_path / 'positions.bin')
+    assert write_binary(path, read_positions(str(text))) == 1
+    assert [position['id'] for position in read_positions(path)] == [2]
+    output = str(tmp_path / 'analysis.jsonl')
+    run(str(text), output=output, workers=1, depth=1, t=10)
+    with open(output) as output_file:
+        records = {record['id']: record for record in map(json.loads, output_file)}
+    assert 'error' in records['1'] and 'error' not in records['2']
+
+
+def test_run_writes_one_record_per_position(tmp_path):
+    text = tmp_path / 'positions.txt'
+    text.write_text('# two positions and a bad line\n'
+                    '1 3 3 X X...O....\n'
+                    '2 4 3 O XX..$.O.O...X..O\n'
+                    '3 4 3 X\n')
+    output = str(tmp_path / 'analysis.jsonl')
+    assert run(str(text), output=output, workers=1, depth=2, t=10) == 3
+    with open(output) as output_file:
+        records = {record['id']: record for record in map(json.loads, output_file)}
+    assert sorted(records) == ['1', '2', '3']
+    for position_id in ('1', '2'):
+        record = records[position_id]
+        assert sorted(record) == ['id', 'move', 'nodes', 'time', 'value']
+        assert len(record['move']) == 2 and record['nodes'] > 0 and record['time'] >= 0
+    assert sorted(records['3']) == ['error', 'id']
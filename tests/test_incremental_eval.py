@@ -0,0 +1,37 @@
+import random
+
+from Game import Game
+
+
+def random_blocs(rng, n):
+    cells = [(x, y) for x in range(n) for y in range(n)]
+    return ['%d %d' % cell for cell in rng.sample(cells, rng.randint(0, n))]
+
+
+def test_e2_total_matches_heuristic2_eval():
+    # random make_move()/undo_move() sequences, the running total is checked after every step
+    rng = random.Random(6)
+    for _ in range(400):
+        n = rng.randint(3, 10)
+        blocs = random_blocs(rng, n)
+        g = Game(recommend=False, board_size=n, bloc_num=len(blocs), blocs_positions=blocs, win_size=rng.randint(3, min(5, n)),
+                 incremental_eval=True, seed=rng.getrandbits(64))
+        # pieces already on the board when the search starts are counted by init_line_counts()
+        for (x, y) in rng.sample([(x, y) for x in range(n) for y in range(n) if g.current_state[x][y] == '.'], rng.randint(0, n)):
+            g.current_state[x][y] = rng.choice('XO')
+            g.empty_count -= 1
+        g.init_line_counts()
+        assert g.e2_total == g.heuristic2_eval()
+        played = []
+        for _ in range(rng.randint(1, 3 * n)):
+            empty = [(x, y) for x in range(n) for y in range(n) if g.current_state[x][y] == '.']
+            if played and (not empty or rng.random() < 0.3):
+                g.undo_move(*played.pop())
+            elif empty:
+                (x, y) = rng.choice(empty)
+                g.make_move(x, y, rng.choice('XO'))
+                played.append((x, y))
+            assert g.e2_total == g.heuristic2_eval()
+        while played:
+            g.undo_move(*played.pop())
+            assert g.e2_total == g.heuristic2_eval()
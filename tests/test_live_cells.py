@@ -0,0 +1,37 @@
+import os
+import time
+
+import pytest
+
+from Analyze import read_positions
+from Game import Game
+from ParallelSearch import decode_board
+
+POSITIONS = list(read_positions(os.path.join(os.path.dirname(__file__), 'data', 'positions.txt')))
+OPTIONS = [{}, {'bitboard': True}, {'stack_search': True}, {'pvs': True, 'tt_size': 1 << 14, 'incremental_eval': True}]
+
+
+def search(position, algo, h, depth, **options):
+    n = int(position['n'])
+    blocs = [F'{k // n} {k % n}' for (k, cell) in enumerate(position['cells']) if cell == '$']
+    g = Game(recommend=False, board_size=n, bloc_num=len(blocs), blocs_positions=blocs, win_size=int(position['s']), t=10 ** 6,
+             max_depth_X=depth, max_depth_O=depth, seed=21, **options)
+    g.current_state = decode_board(position['cells'].encode('ascii'), n)
+    g.empty_count = position['cells'].count('.')
+    return g.search(algo, max=position['side'] == 'O', h=h, startTime=time.time())
+
+
+@pytest.mark.parametrize('options', OPTIONS, ids=['plain', 'bitboard', 'stack', 'pvs+tt+incremental'])
+def test_live_cells_keep_the_values(options):
+    # heuristic searches are unchanged, searches without heuristic keep their values
+    for position in POSITIONS:
+        for algo in (Game.MINIMAX, Game.ALPHABETA):
+            depth = 2 if algo == Game.MINIMAX else 3
+            settings = [(1, depth), (2, depth)] + ([(0, 9)] if position['n'] == '3' else [])
+            for (h, depth) in settings:
+                expected = search(position, algo, h, depth, **options)
+                result = search(position, algo, h, depth, live_cells=True, **options)
+                if h == 0:
+                    assert result[0] == expected[0], (position['id'], algo, h)
+                else:
+                    assert result == expected, (position['id'], algo, h)
@@ -0,0 +1,41 @@
+import os
+import time
+
+import pytest
+
+from Analyze import read_positions
+from Game import Game
+from ParallelSearch import decode_board
+
+POSITIONS = list(read_positions(os.path.join(os.path.dirname(__file__), 'data', 'positions.txt')))
+OPTIONS = [{}, {'tt_size': 1 << 14}, {'symmetry': True}, {'tt_size': 1 << 14, 'symmetry': True}]
+
+
+def search(position, h, depth, **options):
+    # (value, x, y) and node count of one alphabeta() search of a fresh game
+    n = int(position['n'])
+    blocs = [F'{k // n} {k % n}' for (k, cell) in enumerate(position['cells']) if cell == '$']
+    g = Game(recommend=False, board_size=n, bloc_num=len(blocs), blocs_positions=blocs, win_size=int(position['s']), t=10 ** 6,
+             max_depth_X=depth, max_depth_O=depth, seed=18, **options)
+    g.current_state = decode_board(position['cells'].encode('ascii'), n)
+    g.empty_count = position['cells'].count('.')
+    result = g.search(Game.ALPHABETA, max=position['side'] == 'O', h=h, startTime=time.time())
+    return (result, g.stats.totals().node_count())
+
+
+@pytest.mark.parametrize('options', OPTIONS, ids=['plain', 'tt', 'symmetry', 'tt+symmetry'])
+def test_pvs_matches_alphabeta(options):
+    # same value on every position of the corpus, in fewer nodes over the corpus
+    nodes = [0, 0]
+    for position in POSITIONS:
+        settings = [(1, 3), (2, 3)] + ([(0, 9)] if position['n'] == '3' else [])
+        for (h, depth) in settings:
+            (expected, alphabeta_nodes) = search(position, h, depth, **options)
+            (result, pvs_nodes) = search(position, h, depth, pvs=True, **options)
+            assert result[0] == expected[0], (position['id'], h)
+            if not options:
+                # nothing but the move order of alphabeta() decides the move
+                assert result == expected, (position['id'], h)
+            nodes[0] += alphabeta_nodes
+            nodes[1] += pvs_nodes
+    assert nodes[1] < nodes[0]
@@ -0,0 +1,30 @@
+import io
+import time
+
+from Game import Game
+
+
+def test_ponder_hit_still_runs_iterative_deepening():
+    # human X plays every recommended move, AI O searches with iterative deepening
+    g = Game(board_size=4, win_size=3, t=1, max_depth_X=3, max_depth_O=3, iterative=True, tt_size=1 << 14, ponder=True, seed=20, quiet=True)
+    g.console = False
+    calls = []
+    iterative_deepening = g.iterative_deepening
+
+    def record(algo=Game.ALPHABETA, max=False, h=0, first=None):
+        result = iterative_deepening(algo=algo, max=max, h=h, first=first)
+        calls.append((max, first, result))
+        return result
+
+    def input_move():
+        # the human thinks while the pondering thread searches
+        time.sleep(0.3)
+        return (calls[-1][2][1], calls[-1][2][2])
+
+    g.iterative_deepening = record
+    g.input_move = input_move
+    g.play(algo1=Game.ALPHABETA, algo2=Game.ALPHABETA, player_x=Game.HUMAN, player_o=Game.AI, heuristic_x=2, heuristic_o=2, trace_file=io.StringIO())
+    assert g.ponderer.hits > 0
+    # a hit does not replace the search: every move was searched until the deadline, the pondered ones from their pondered move
+    assert len([call for call in calls if call[1] is not None]) == g.ponderer.hits
+    assert any(first is not None for (max, first, _) in calls if max)
@@ -0,0 +1,47 @@
+import math
+import random
+
+from SearchStats import TimeStats
+
+PERCENTILES = (1, 10, 25, 50, 75, 90, 95, 99, 99.9, 100)
+
+
+def durations(count, seed):
+    # move times from 100 microseconds to a minute, spread over every power of two in between
+    rng = random.Random(seed)
+    return [10 ** rng.uniform(-4, 1.8) for _ in range(count)]
+
+
+def test_merged_streams_match_one_stream():
+    values = durations(5000, 24)
+    whole = TimeStats()
+    for value in values:
+        whole.add(value)
+    # uneven parts, one of them empty, merged in a tree as the series and tournament workers do
+    bounds = [0, 1, 700, 700, 2100, 4999, 5000]
+    parts = []
+    for (start, end) in zip(bounds, bounds[1:]):
+        part = TimeStats()
+        for value in values[start:end]:
+            part.add(value)
+        parts.append(part)
+    merged = parts[0].merge(parts[1]).merge(parts[2].merge(parts[3])).merge(parts[4].merge(parts[5]))
+    assert merged.count == whole.count == len(values)
+    assert math.isclose(merged.mean, whole.mean, rel_tol=1e-12)
+    assert math.isclose(merged.running.std(), whole.running.std(), rel_tol=1e-9)
+    assert (merged.running.min, merged.running.max) == (min(values), max(values))
+    assert [merged.percentile(p) for p in PERCENTILES] == [whole.percentile(p) for p in PERCENTILES]
+    assert merged.summary() == dict(whole.summary(), mean=merged.mean, std=merged.running.std())
+
+
+def test_percentiles_within_one_64th():
+    values = durations(20000, 25)
+    stats = TimeStats()
+    for value in values:
+        stats.add(value)
+    ordered = sorted(values)
+    for p in PERCENTILES:
+        exact = ordered[max(1, math.ceil(p / 100 * len(values))) - 1]
+        # the upper bound of the bucket of the exact value, never below it
+        assert exact <= stats.percentile(p) <= exact * (1 + 1 / 64), p
+    assert stats.percentile(100) == max(values)
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import threading
+
+from Service import AnalysisClient, AnalysisService
+
+
+def exchange(lines):
+    # the answers of a service with one worker to the raw request lines sent on one connection
+    async def run():
+        service = AnalysisService(workers=1)
+        server = await service.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        (reader, writer) = await asyncio.open_connection('127.0.0.1', port)
+        answers = []
+        try:
+            for line in lines:
+                writer.write((line + '\n').encode())
+                await writer.drain()
+                answers.append(json.loads(await asyncio.wait_for(reader.readline(), 30)))
+        finally:
+            writer.close()
+            server.close()
+            service.close()
+        return answers
+    return asyncio.run(run())
+
+
+def test_every_line_gets_an_answer():
+    request = {'id': 7, 'n': 3, 's': 3, 'cells': 'X...O....', 'side': 'X', 'depth': 2, 'algo': 1, 'h': 2}
+    answers = exchange(['[1, 2]', '"text"', 'not json', json.dumps({'id': 3, 'n': 3}), json.dumps(request)])
+    assert [answer.get('id') for answer in answers] == [None, None, None, 3, 7]
+    assert all('error' in answer for answer in answers[:4])
+    assert 'error' not in answers[4] and answers[4]['move']
+
+
+class running_service:
+    # an AnalysisService on a free localhost port, its event loop on a background thread
+    def __init__(self, **settings):
+        self.service = AnalysisService(workers=1, **settings)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        self.server = asyncio.run_coroutine_threadsafe(self.service.start(port=0), self.loop).result(30)
+        return AnalysisClient(('127.0.0.1', self.server.sockets[0].getsockname()[1]))
+
+    def __exit__(self, *exc_info):
+        async def stop():
+            self.server.close()
+            self.service.close()
+            # connection handlers still waiting for a line
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        asyncio.run_coroutine_threadsafe(stop(), self.loop).result(30)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def requests():
+    first = {'n': 3, 's': 3, 'cells': 'X...O....', 'side': 'X', 'depth': 2, 'algo': 1, 'h': 2}
+    second = dict(first, cells='X.O.O...X', side='X')
+    return (first, second)
+
+
+def test_batch_shares_duplicates_and_keeps_order():
+    (first, second) = requests()
+    with running_service() as client:
+        answers = client.analyze_many([first, second, first, first, second])
+        # answers come back in request order, a position is searched once whoever asked for it
+        assert [answer['id'] for answer in answers] == [1, 2, 3, 4, 5]
+        assert [answer['move'] for answer in answers[2:]] == [answers[0]['move'], answers[0]['move'], answers[1]['move']]
+        assert [answer['cached'] for answer in answers[:2]] == [False, False]
+        assert all(answer['cached'] for answer in answers[2:])
+        stats = client.stats()
+        assert stats['requests'] == 5 and stats['searches'] == 2 and stats['shared'] + stats['hits'] == 3
+        assert stats['cached'] == 2 and stats['pending'] == 0 and stats['errors'] == 0
+        # a later request for a searched position is a cache hit
+        again = client.analyze(**first)
+        assert again['cached'] and again['move'] == answers[0]['move'] and again['value'] == answers[0]['value']
+        assert client.stats()['hits'] == stats['hits'] + 1
+        client.close()
+
+
+def test_lru_evicts_past_cache_size():
+    (first, second) = requests()
+    with running_service(cache_size=1) as client:
+        assert not client.analyze(**first)['cached']
+        assert not client.analyze(**second)['cached']
+        # first was the least recently used of the two, only second is left
+        assert client.analyze(**second)['cached']
+        assert not client.analyze(**first)['cached']
+        stats = client.stats()
+        assert stats['searches'] == 3 and stats['cached'] == 1
+        client.close()
+
+
+def test_requests_are_validated():
+    (first, _) = requests()
+    bad = [dict(first, n=11, cells='.' * 121), dict(first, blocs=['0 0']), dict(first, blocs=['1 10']),
+           dict(first, options={'solved_cache': '/tmp/anywhere.db'}), dict(first, options={'book': '/'}), dict(first, options={'ponder': True})]
+    with running_service() as client:
+        answers = client.analyze_many(bad)
+        assert all('error' in answer for answer in answers)
+        assert client.stats()['searches'] == 0
+        client.close()
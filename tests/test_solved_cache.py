@@ -0,0 +1,71 @@
+import time
+
+from Game import Game
+from SolvedCache import SolvedCache
+
+
+def test_store_and_lookup(tmp_path):
+    cache = SolvedCache(str(tmp_path / 'solved.db'))
+    key = SolvedCache.key(4, 3, [], '.' * 16, False, 3, Game.ALPHABETA, 2, False, [])
+    assert cache.lookup(key) is None
+    cache.store(key, (-7, 1, 2))
+    assert cache.lookup(key) == (-7, 1, 2)
+    assert cache.lookup(SolvedCache.key(4, 3, [], '.' * 16, True, 3, Game.ALPHABETA, 2, False, [])) is None
+    assert (cache.hits, cache.misses, cache.stores) == (1, 2, 1)
+    cache.close()
+
+
+def test_timed_out_search_is_not_stored(tmp_path):
+    path = str(tmp_path / 'solved.db')
+
+    def search(t, elapsed):
+        g = Game(recommend=False, board_size=5, win_size=4, t=t, max_depth_X=4, max_depth_O=4, seed=25, solved_cache=path)
+        triplet = g.search(Game.ALPHABETA, max=False, h=2, startTime=time.time() - elapsed)
+        stores = g.solved.stores
+        g.close()
+        return (triplet, stores)
+
+    # the search starts past its time limit, so it is cut short and its result is not the one of depth 4
+    assert search(0.5, 1)[1] == 0
+    (triplet, stores) = search(10 ** 6, 0)
+    assert stores == 1
+    cache = SolvedCache(path)
+    assert cache.totals()['entries'] == 1
+    # the full search is the one answered from the file
+    g = Game(recommend=False, board_size=5, win_size=4, t=10 ** 6, max_depth_X=4, max_depth_O=4, seed=25, solved_cache=path)
+    assert g.search(Game.ALPHABETA, max=False, h=2, startTime=time.time()) == triplet and g.solved.hits == 1
+    g.close()
+    cache.close()
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+    cache = SolvedCache(str(tmp_path / 'solved.db'), max_entries=10)
+    keys = [SolvedCache.key(k) for k in range(SolvedCache.EVICT_INTERVAL)]
+    for key in keys[:-1]:
+        cache.store(key, (0, 0, 0))
+    # the first key is hit, its use time is written before the eviction the next store runs
+    assert cache.lookup(keys[0]) == (0, 0, 0)
+    cache.store(keys[-1], (0, 0, 0))
+    assert cache.totals()['entries'] == 10 - 10 // 10
+    assert cache.lookup(keys[0]) is not None and cache.lookup(keys[-1]) is not None
+    assert cache.lookup(keys[1]) is None
+    cache.close()
+
+
+def test_counters_are_added_once(tmp_path):
+    path = str(tmp_path / 'solved.db')
+    key = SolvedCache.key('position')
+    first = SolvedCache(path)
+    second = SolvedCache(path)
+    first.store(key, (10, 0, 0))
+    assert second.lookup(key) == (10, 0, 0)
+    assert first.lookup(SolvedCache.key('other')) is None
+    first.close()
+    first.close()
+    second.close()
+    assert SolvedCache(path).totals() == {'hits': 1, 'misses': 1, 'stores': 1, 'entries': 1}
+    # an instance used again after close() only adds what it counted since
+    assert first.lookup(key) == (10, 0, 0)
+    first.close()
+    second.close()
+    assert SolvedCache(path).totals() == {'hits': 2, 'misses': 1, 'stores': 1, 'entries': 1}
@@ -0,0 +1,33 @@
+import os
+import time
+
+import pytest
+
+from Analyze import read_positions
+from Game import Game
+from ParallelSearch import decode_board
+
+POSITIONS = list(read_positions(os.path.join(os.path.dirname(__file__), 'data', 'positions.txt')))
+
+
+def search(position, algo, h, depth, **options):
+    # (value, x, y) and node count of one search of a fresh game
+    n = int(position['n'])
+    blocs = [F'{k // n} {k % n}' for (k, cell) in enumerate(position['cells']) if cell == '$']
+    g = Game(recommend=False, board_size=n, bloc_num=len(blocs), blocs_positions=blocs, win_size=int(position['s']), t=10 ** 6,
+             max_depth_X=depth, max_depth_O=depth, seed=22, **options)
+    g.current_state = decode_board(position['cells'].encode('ascii'), n)
+    g.empty_count = position['cells'].count('.')
+    result = g.search(algo, max=position['side'] == 'O', h=h, startTime=time.time())
+    return (result, g.stats.totals().node_count())
+
+
+@pytest.mark.parametrize('algo', [Game.MINIMAX, Game.ALPHABETA], ids=['minimax', 'alphabeta'])
+def test_stack_search_matches_recursion(algo):
+    # same value, move and node count as the recursive functions on every position of the corpus
+    for position in POSITIONS:
+        depth = 2 if algo == Game.MINIMAX else 3
+        settings = [(1, depth), (2, depth)] + ([(0, 9)] if position['n'] == '3' else [])
+        for (h, depth) in settings:
+            expected = search(position, algo, h, depth)
+            assert search(position, algo, h, depth, stack_search=True) == expected, (position['id'], h)
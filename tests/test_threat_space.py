@@ -0,0 +1,46 @@
+import time
+
+from Game import Game
+
+
+# 6x6 positions (pieces X, O, X, O, ... in order) where the other side has a forced win that the threat search
+# finds a single defense against
+DEFENSES = [
+    [(3, 0), (0, 0), (5, 4), (0, 5), (4, 2), (0, 3), (5, 1), (4, 4), (4, 1), (0, 1)],
+    [(0, 5), (2, 3), (2, 2), (0, 1), (5, 4), (2, 0), (0, 2), (1, 2)],
+    [(3, 5), (1, 4), (5, 2), (2, 1), (3, 1), (1, 3), (3, 4), (5, 0), (4, 3)],
+]
+
+
+def game_of(cells, **options):
+    g = Game(recommend=False, board_size=6, win_size=4, t=100, max_depth_X=2, max_depth_O=2, seed=5, **options)
+    for (k, (x, y)) in enumerate(cells):
+        g.current_state[x][y] = 'X' if k % 2 == 0 else 'O'
+    g.empty_count -= len(cells)
+    return g
+
+
+def test_defense_is_searched_not_played():
+    # the only defense the threat search finds is tried first, the value and move are those of the main search
+    for cells in DEFENSES:
+        g = game_of(cells, threats=True, bitboard=True)
+        result = g.search(algo=Game.ALPHABETA, max=len(cells) % 2 == 1, h=2, startTime=time.time())
+        assert g.threats.defense is not None
+        expected = game_of(cells, bitboard=True).search(algo=Game.ALPHABETA, max=len(cells) % 2 == 1, h=2, startTime=time.time())
+        assert result[0] == expected[0]
+        assert g.root_move is None
+
+
+def test_no_time_no_threat_search():
+    # with t=0 the threat search does not run at all, instead of running without a clock
+    g = game_of(DEFENSES[0], threats=True, bitboard=True)
+    g.t = 0
+    g.threats.search(max=False, startTime=time.time())
+    assert g.threats.nodes == 0 and g.threats.defense is None
+
+
+def test_forced_win_is_played():
+    # X: three in a column with both ends open is a win the depth 1 search cannot see as one
+    g = game_of([(2, 1), (0, 0), (2, 2), (5, 5), (2, 3), (0, 5)], threats=True)
+    (value, x, y) = g.search(algo=Game.ALPHABETA, max=False, h=2, startTime=time.time())
+    assert value == 10 ** 4 and (x, y) in ((2, 0), (2, 4))
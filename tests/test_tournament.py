@@ -0,0 +1,44 @@
+import csv
+import json
+
+import Tournament
+
+CONFIG = {'n': [3], 's': [3], 't': [5], 'd1': [1, 2], 'd2': [1], 'h1': [2], 'h2': [2]}
+
+
+def test_resume_after_a_cut_jsonl_line(tmp_path):
+    output = str(tmp_path / 'results.jsonl')
+    (first, second) = Tournament.expand_grid(CONFIG)
+    with open(output, 'w') as output_file:
+        output_file.write(json.dumps(dict(first, winner='X')) + '\n')
+        output_file.write(json.dumps(dict(second, winner='X'))[:40])
+    Tournament.run(CONFIG, output=output, workers=1)
+    with open(output) as output_file:
+        records = [json.loads(line) for line in output_file]
+    assert [record['id'] for record in records] == [first['id'], second['id']]
+
+
+def test_resume_after_a_cut_csv_row(tmp_path):
+    output = str(tmp_path / 'results.csv')
+    (first, second) = Tournament.expand_grid(CONFIG)
+    with open(output, 'w', newline='') as output_file:
+        writer = csv.DictWriter(output_file, fieldnames=Tournament.FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerow(dict(first, winner='X'))
+        # the id of the cut row is complete, the game must still be played again
+        output_file.write(second['id'] + ',3,0')
+    Tournament.run(CONFIG, output=output, workers=1)
+    with open(output, newline='') as output_file:
+        rows = list(csv.DictReader(output_file))
+    assert [row['id'] for row in rows] == [first['id'], second['id']]
+    assert rows[1]['winner'] in ('X', 'O', '.')
+
+
+def test_cut_header_of_a_new_csv(tmp_path):
+    output = str(tmp_path / 'results.csv')
+    with open(output, 'w') as output_file:
+        output_file.write('id,n,b')
+    Tournament.run(CONFIG, output=output, workers=1)
+    with open(output, newline='') as output_file:
+        rows = list(csv.DictReader(output_file))
+    assert len(rows) == 2 and rows[0]['winner'] in ('X', 'O', '.')